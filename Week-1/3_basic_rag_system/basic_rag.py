@@ -1,151 +1,288 @@
-import PyPDF2
-import docx
 import os
+import hashlib
+import json
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import islice
+from typing import Iterable, Tuple
+import numpy as np
 import chromadb
 from chromadb.utils import embedding_functions
 import streamlit as st
 from langchain_aws import ChatBedrock
+from document_parser import process_document, parse_document
+
+MANIFEST_PATH = os.path.join("vector_db", "ingest_manifest.json")
+
+# Retrieval and indexing settings (benchmark_hnsw.py helps choose them)
+TOP_K = int(os.getenv("RAG_TOP_K", "2"))
+ADD_BATCH_SIZE = int(os.getenv("RAG_ADD_BATCH_SIZE", "100"))
+
+# Maximal marginal relevance: re-rank FETCH_K nearest candidates, trading
+# relevance (MMR_LAMBDA = 1) against diversity (MMR_LAMBDA = 0)
+RETRIEVAL_MODE = os.getenv("RAG_RETRIEVAL_MODE", "similarity")
+FETCH_K = int(os.getenv("RAG_FETCH_K", "20"))
+MMR_LAMBDA = min(1.0, max(0.0, float(os.getenv("RAG_MMR_LAMBDA", "0.5"))))
+
+# Slider ranges in the app; environment defaults are clamped into them
+MAX_TOP_K = 10
+MAX_FETCH_K = 50
+
+# Chroma HNSW settings for a new collection; unset keys keep Chroma's defaults
+# (l2, M=16, construction_ef=100, search_ef=10). The space and graph settings
+# only apply when the collection is created.
+HNSW_ENV = {
+    "hnsw:space": ("RAG_HNSW_SPACE", str),
+    "hnsw:M": ("RAG_HNSW_M", int),
+    "hnsw:construction_ef": ("RAG_HNSW_CONSTRUCTION_EF", int),
+    "hnsw:search_ef": ("RAG_HNSW_SEARCH_EF", int),
+    "hnsw:batch_size": ("RAG_HNSW_BATCH_SIZE", int),
+    "hnsw:sync_threshold": ("RAG_HNSW_SYNC_THRESHOLD", int),
+}
+
+
+def hnsw_settings():
+    """HNSW collection metadata from the RAG_HNSW_* environment variables"""
+    return {
+        key: cast(os.environ[env])
+        for key, (env, cast) in HNSW_ENV.items()
+        if os.getenv(env)
+    }
+
+
+def add_to_collection(collection, records: Iterable[Tuple[str, str, dict]], batch_size: int = ADD_BATCH_SIZE):
+    """Upsert streamed records into the collection in batches; returns the number written"""
+    records = iter(records)
+    added = 0
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            return added
+        ids, texts, metadatas = zip(*batch)
+        collection.upsert(
+            documents=list(texts),
+            metadatas=list(metadatas),
+            ids=list(ids)
+        )
+        added += len(batch)
 
 
-def read_txt_files(file_path: str):
-    """Reads text files"""
-    
-    with open(file_path, "r") as f:
-        return f.read()
-    
-def read_pdf_file(file_path: str):
-    """Read pdf files"""
-    text = ""
-    with open(file_path, 'rb') as file:
-        pdf_reader = PyPDF2.PdfReader(file)
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
-    return text
-    
+def file_hash(file_path: str):
+    """Content hash of a file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
 
-def read_docx_file(file_path: str):
-    """Read word file"""
-    doc = docx.Document(file_path)
-    return "\n".join([paragraph.text for paragraph in doc.paragraphs])
 
+def load_manifest(manifest_path: str):
+    """Manifest of indexed files: path -> size, mtime, content hash"""
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, "r") as f:
+        return json.load(f)
 
-def read_files(file_path: str):
-    """Read documents and returns the context based on type"""
-    
-    _, file_extension = os.path.splitext(file_path)
-      
-    if file_extension == '.txt':
-        return read_txt_files(file_path)
-    elif file_extension == '.pdf':
-        return read_pdf_file(file_path)
-    elif file_extension == '.docx':
-        return read_docx_file(file_path)
-
-
-def split_text(text: str, chunk_size: int = 500):
-    """Split text into chunks while preserving sentence boundaries"""
-    sentences = text.replace('\n', ' ').split('. ')
-    chunks = []
-    current_chunk = []
-    current_size = 0
-
-    for sentence in sentences:
-        sentence = sentence.strip()
-        if not sentence:
-            continue
 
-        if not sentence.endswith('.'):
-            sentence += '.'
+def save_manifest(manifest: dict, manifest_path: str):
+    """Write the manifest atomically"""
+    os.makedirs(os.path.dirname(manifest_path) or ".", exist_ok=True)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, manifest_path)
 
-        sentence_size = len(sentence)
 
-        if current_size + sentence_size > chunk_size and current_chunk:
-            chunks.append(' '.join(current_chunk))
-            current_chunk = [sentence]
-            current_size = sentence_size
-        else:
-            current_chunk.append(sentence)
-            current_size += sentence_size
+def sync_file(collection, file_path: str, records: Iterable[Tuple[str, str, dict]]):
+    """Upsert a file's chunks, then delete its chunks that no longer exist"""
+    file_name = os.path.basename(file_path)
+    existing = set(collection.get(where={"source": file_name}, include=[])["ids"])
+    added = add_to_collection(collection, records)
+    stale = existing - {f"{file_name}_chunk_{i}" for i in range(added)}
+    if stale:
+        collection.delete(ids=list(stale))
+    return added, len(stale)
 
-    if current_chunk:
-        chunks.append(' '.join(current_chunk))
 
-    return chunks
+def process_and_add_documents(collection, folder_path: str, manifest_path: str = MANIFEST_PATH, workers: int = None):
+    """
+    Index new and changed documents in a folder and remove deleted ones.
 
+    Files whose size and mtime match the manifest are skipped without being
+    read; files that were only touched (same content hash) are skipped too.
+    Changed files are parsed in a process pool and upserted.
+    """
+    start = time.time()
+    manifest = load_manifest(manifest_path)
+    summary = {"unchanged": 0, "changed": 0, "deleted": 0, "chunks": 0, "stale_chunks": 0, "failed": 0}
+
+    current = {}
+    for entry in os.scandir(folder_path):
+        if entry.is_file():
+            stat = entry.stat()
+            current[entry.path] = (stat.st_size, stat.st_mtime_ns)
+
+    changed = []
+    for file_path, (size, mtime) in current.items():
+        known = manifest.get(file_path)
+        if known and known["size"] == size and known["mtime"] == mtime:
+            summary["unchanged"] += 1
+            continue
+        digest = file_hash(file_path)
+        if known and known["hash"] == digest:
+            known.update(size=size, mtime=mtime)
+            summary["unchanged"] += 1
+            continue
+        changed.append((file_path, size, mtime, digest))
 
+    for file_path in [path for path in manifest if path not in current]:
+        collection.delete(where={"source": os.path.basename(file_path)})
+        del manifest[file_path]
+        summary["deleted"] += 1
+        print(f"Removed {os.path.basename(file_path)}")
 
-def process_document(file_path: str):
-    """Process a single document"""
-    try:
-        content = read_files(file_path)
+    def record(file_path, size, mtime, digest, records):
+        print(f"Processing {os.path.basename(file_path)}...")
+        added, stale = sync_file(collection, file_path, records)
+        manifest[file_path] = {"size": size, "mtime": mtime, "hash": digest}
+        summary["changed"] += 1
+        summary["chunks"] += added
+        summary["stale_chunks"] += stale
+        print(f"Added {added} chunks to collection ({stale} stale removed)")
+
+    if len(changed) <= 1 or workers == 1:
+        # Nothing to fan out: stream the file straight into the collection
+        for file_path, size, mtime, digest in changed:
+            try:
+                record(file_path, size, mtime, digest, process_document(file_path))
+            except Exception as e:
+                summary["failed"] += 1
+                print(f"Error processing {file_path}: {str(e)}")
+    else:
+        # Spawned, not forked: forking the threaded Streamlit server after torch
+        # is loaded can deadlock the children. Workers only import document_parser.
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            futures = {pool.submit(parse_document, item[0]): item for item in changed}
+            for future in as_completed(futures):
+                file_path, size, mtime, digest = futures[future]
+                try:
+                    record(file_path, size, mtime, digest, future.result())
+                except Exception as e:
+                    summary["failed"] += 1
+                    print(f"Error processing {file_path}: {str(e)}")
+
+    save_manifest(manifest, manifest_path)
+    summary["seconds"] = round(time.time() - start, 2)
+    print(f"Indexed folder: {summary}")
+    return summary
+
+
+def mmr_select(query_embedding, candidate_embeddings, top_k: int, lambda_mult: float = MMR_LAMBDA):
+    """Indices of top_k candidates chosen by maximal marginal relevance"""
+    candidates = np.asarray(candidate_embeddings, dtype=np.float32)
+    query_vector = np.asarray(query_embedding, dtype=np.float32)
+    candidates = candidates / np.maximum(np.linalg.norm(candidates, axis=1, keepdims=True), 1e-12)
+    query_vector = query_vector / max(np.linalg.norm(query_vector), 1e-12)
+
+    relevance = candidates @ query_vector
+    similarity = candidates @ candidates.T
+    top_k = min(top_k, len(candidates))
+
+    selected = [int(np.argmax(relevance))]
+    # Similarity of every candidate to its closest already-selected chunk
+    max_similarity = similarity[selected[0]].copy()
+    for _ in range(top_k - 1):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * max_similarity
+        scores[selected] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        np.maximum(max_similarity, similarity[best], out=max_similarity)
+    return selected
+
+
+def retrieve(collection, query: str, top_k: int = TOP_K, mode: str = RETRIEVAL_MODE,
+             fetch_k: int = FETCH_K, lambda_mult: float = MMR_LAMBDA):
+    """Retrieve content using semantix search, optionally re-ranked with MMR"""
+    if mode != "mmr":
+        results = collection.query(
+            query_texts=[query],
+            n_results=top_k
+        )
+        return results
 
-        chunks = split_text(content)
+    query_embedding = get_embedding_function()([query])[0]
+    candidates = collection.query(
+        query_embeddings=[query_embedding],
+        n_results=max(fetch_k, top_k),
+        include=["embeddings", "documents", "metadatas", "distances"]
+    )
+    if not candidates["ids"][0]:
+        return candidates
 
-        file_name = os.path.basename(file_path)
-        metadatas = [{"source": file_name, "chunk": i} for i in range(len(chunks))]
-        ids = [f"{file_name}_chunk_{i}" for i in range(len(chunks))]
+    order = mmr_select(query_embedding, candidates["embeddings"][0], top_k, lambda_mult)
+    # Same shape as a plain query result, without the embeddings
+    return {
+        key: [[candidates[key][0][i] for i in order]]
+        for key in ("ids", "documents", "metadatas", "distances")
+    }
 
-        return ids, chunks, metadatas
-    except Exception as e:
-        print(f"Error processing {file_path}: {str(e)}")
-        return [], [], []
+def get_context(results):
+    """Extract context from search results"""
+    
+    context = "\n\n".join(results['documents'][0])
+    return context
 
+@st.cache_resource
+def get_resource_timings():
+    """Process-wide record of how long each cached resource took to create"""
+    return {"loads": 0}
 
-def add_to_collection(collection, ids, texts, metadatas):
-    """Add documents to collection in batches"""
-    if not texts:
-        return
 
-    batch_size = 100
-    for i in range(0, len(texts), batch_size):
-        end_idx = min(i + batch_size, len(texts))
-        collection.add(
-            documents=texts[i:end_idx],
-            metadatas=metadatas[i:end_idx],
-            ids=ids[i:end_idx]
-        )
+def timed_load(name: str, factory):
+    """Create a resource and record its cold-start time"""
+    start = time.perf_counter()
+    resource = factory()
+    timings = get_resource_timings()
+    timings[name] = time.perf_counter() - start
+    timings["loads"] += 1
+    print(f"Loaded {name} in {timings[name]:.2f}s")
+    return resource
 
-def process_and_add_documents(collection, folder_path: str):
-    """Process all documents in a folder and add to collection"""
-    files = [os.path.join(folder_path, file) 
-             for file in os.listdir(folder_path) 
-             if os.path.isfile(os.path.join(folder_path, file))]
 
-    for file_path in files:
-        print(f"Processing {os.path.basename(file_path)}...")
-        ids, texts, metadatas = process_document(file_path)
-        add_to_collection(collection, ids, texts, metadatas)
-        print(f"Added {len(texts)} chunks to collection")
+# Resources below are created once per process and shared across reruns and
+# sessions. Nothing builds them at import time: the embedding model loads the
+# first time the collection is needed (processing or retrieval).
+@st.cache_resource(show_spinner="Loading embedding model...")
+def get_embedding_function():
+    return timed_load("embedding model", lambda: embedding_functions.SentenceTransformerEmbeddingFunction(
+        model_name="all-MiniLM-L6-v2"
+    ))
 
 
-def retrieve(collection, query: str, top_k: int = 2):
-    """Retrieve content using semantix search"""
-    results = collection.query(
-        query_texts=[query],
-        n_results=top_k
-    )
-    return results
+@st.cache_resource
+def get_client():
+    return timed_load("chroma client", lambda: chromadb.PersistentClient(path="vector_db"))
 
-def get_context(results):
-    """Extract context from search results"""
-    
-    context = "\n\n".join(results['documents'][0])
-    return context
 
-embedding_function = embedding_functions.SentenceTransformerEmbeddingFunction(
-    model_name="all-MiniLM-L6-v2"
-)
+@st.cache_resource
+def get_collection():
+    return timed_load("collection", lambda: get_client().get_or_create_collection(
+        name="file_collection",
+        embedding_function=get_embedding_function(),
+        metadata=hnsw_settings() or None
+    ))
 
-client = chromadb.PersistentClient(path="vector_db")
 
-collection = client.get_or_create_collection(
-    name="file_collection",
-    embedding_function=embedding_function
-)
+@st.cache_resource
+def get_llm():
+    return timed_load("llm", lambda: ChatBedrock(model_id="anthropic.claude-3-5-sonnet-20240620-v1:0"))
 
-def get_response(llm, query: str):
+
+def get_response(llm, collection, query: str, top_k: int = TOP_K, **retrieval):
     """Retrieves and gets llm response"""
-    results = retrieve(collection, query)
+    results = retrieve(collection, query, top_k, **retrieval)
     context = get_context(results)
     
     prompt = f"""
@@ -160,23 +297,52 @@ def get_response(llm, query: str):
     return response
 
 # Main Streamlit app
+run_start = time.perf_counter()
+loads_before = get_resource_timings()["loads"]
+
 st.title("Basic RAG System")
 
 with st.sidebar:
     if st.button("Process Documents"):
-        process_and_add_documents(collection, "documents")
-        st.success("Documents processed and added to collection.")
+        summary = process_and_add_documents(get_collection(), "documents")
+        st.success(
+            f"Documents processed: {summary['changed']} updated, {summary['unchanged']} unchanged, "
+            f"{summary['deleted']} removed in {summary['seconds']}s."
+        )
+        if summary["failed"]:
+            st.warning(f"{summary['failed']} documents could not be processed.")
 
 query = st.text_input("Enter your query")
-
-llm = ChatBedrock(model_id="anthropic.claude-3-5-sonnet-20240620-v1:0")
+top_k = st.slider("Chunks to retrieve", min_value=1, max_value=MAX_TOP_K, value=min(max(TOP_K, 1), MAX_TOP_K))
+mode = st.radio(
+    "Retrieval mode", ["similarity", "mmr"], horizontal=True,
+    index=1 if RETRIEVAL_MODE == "mmr" else 0,
+    help="mmr skips chunks that repeat what is already selected"
+)
+retrieval = {"mode": mode}
+if mode == "mmr":
+    retrieval["fetch_k"] = st.slider(
+        "Candidates to re-rank", min_value=top_k, max_value=MAX_FETCH_K, value=min(max(FETCH_K, top_k), MAX_FETCH_K)
+    )
+    retrieval["lambda_mult"] = st.slider("Relevance vs diversity", min_value=0.0, max_value=1.0, value=MMR_LAMBDA)
 
 if st.button("Retrieve"):
     if query:
         
-        response = get_response(llm, query)
+        response = get_response(get_llm(), get_collection(), query, top_k, **retrieval)
         result = response.content if hasattr(response, "content") else str(response)
         st.write(result)
 
     else:
-        st.warning("Please enter a query.")
\ No newline at end of file
+        st.warning("Please enter a query.")
+
+# Cold runs created at least one resource; warm reruns reuse them all
+timings = get_resource_timings()
+run_kind = "cold" if timings["loads"] > loads_before else "warm"
+run_ms = (time.perf_counter() - run_start) * 1000
+print(f"Script run ({run_kind}): {run_ms:.0f} ms")
+with st.sidebar.expander("Timings"):
+    st.write(f"This run ({run_kind}): {run_ms:.0f} ms")
+    for name, seconds in timings.items():
+        if name != "loads":
+            st.write(f"{name} cold start: {seconds:.2f}s")
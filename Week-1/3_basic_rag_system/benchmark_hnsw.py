@@ -0,0 +1,147 @@
+"""
+HNSW sizing benchmark for the basic RAG Chroma collection
+
+Builds synthetic corpora of increasing size (clustered unit vectors with the
+dimension of all-MiniLM-L6-v2) in a throwaway persistent Chroma client and
+reports, per corpus size and HNSW setting: index build time, on-disk size,
+p50/p95 query latency and recall@k against brute-force search.
+
+Usage:
+    python benchmark_hnsw.py
+    python benchmark_hnsw.py --sizes 1000 10000 100000 --space cosine --search-ef 10 50 100 --top-k 5
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import numpy as np
+import chromadb
+
+
+def synthetic_corpus(size: int, dim: int, clusters: int, rng):
+    """Unit vectors around random topic centres, closer to real embeddings than uniform noise"""
+    centres = rng.normal(size=(clusters, dim))
+    points = centres[rng.integers(0, clusters, size=size)] + 0.5 * rng.normal(size=(size, dim))
+    return (points / np.linalg.norm(points, axis=1, keepdims=True)).astype(np.float32)
+
+
+def synthetic_queries(corpus, count: int, rng):
+    """Perturbed corpus vectors, so every query has close neighbours"""
+    picked = corpus[rng.integers(0, len(corpus), size=count)]
+    queries = picked + 0.3 * rng.normal(size=picked.shape) / np.sqrt(corpus.shape[1])
+    return (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+
+
+def brute_force(corpus, queries, k: int, space: str, block: int = 64):
+    """Exact top-k ids per query for the given Chroma space"""
+    squared_norms = np.einsum("ij,ij->i", corpus, corpus)
+    truth = []
+    for start in range(0, len(queries), block):
+        dots = queries[start:start + block] @ corpus.T
+        # Smaller is closer; the query norm is constant per row and can be left out
+        distances = squared_norms - 2 * dots if space == "l2" else -dots
+        top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        truth.extend({str(i) for i in row} for row in top)
+    return truth
+
+
+def build_collection(client, corpus, settings: dict, batch_size: int):
+    """Create the collection and add the corpus in batches; returns (collection, seconds)"""
+    collection = client.create_collection(name="benchmark", metadata=settings, embedding_function=None)
+    batch_size = min(batch_size, client.get_max_batch_size())
+    start = time.perf_counter()
+    for i in range(0, len(corpus), batch_size):
+        batch = corpus[i:i + batch_size]
+        collection.add(ids=[str(j) for j in range(i, i + len(batch))], embeddings=batch)
+    return collection, time.perf_counter() - start
+
+
+def measure_queries(collection, queries, truth, k: int):
+    """Per-query latency (ms) and recall@k against the brute-force ids"""
+    # First query loads the index from disk; keep it out of the numbers
+    collection.query(query_embeddings=queries[:1], n_results=k, include=[])
+    latencies, recalls = [], []
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        result = collection.query(query_embeddings=query[None, :], n_results=k, include=[])
+        latencies.append((time.perf_counter() - start) * 1000)
+        recalls.append(len(expected & set(result["ids"][0])) / len(expected))
+    return np.array(latencies), float(np.mean(recalls))
+
+
+def directory_size(path: str):
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, files in os.walk(path)
+        for name in files
+    )
+
+
+def run(args):
+    rng = np.random.default_rng(args.seed)
+    rows = []
+    for size in args.sizes:
+        corpus = synthetic_corpus(size, args.dim, args.clusters, rng)
+        queries = synthetic_queries(corpus, args.queries, rng)
+        truth = brute_force(corpus, queries, args.top_k, args.space)
+
+        for search_ef in args.search_ef:
+            settings = {
+                "hnsw:space": args.space,
+                "hnsw:M": args.m,
+                "hnsw:construction_ef": args.construction_ef,
+                "hnsw:search_ef": search_ef,
+                "hnsw:batch_size": args.hnsw_batch_size,
+                "hnsw:sync_threshold": args.sync_threshold,
+            }
+            with tempfile.TemporaryDirectory() as path:
+                client = chromadb.PersistentClient(path=path)
+                collection, build_seconds = build_collection(client, corpus, settings, args.add_batch_size)
+                latencies, recall = measure_queries(collection, queries, truth, args.top_k)
+                disk_bytes = directory_size(path)
+
+            row = {
+                "size": size,
+                "search_ef": search_ef,
+                "build_s": round(build_seconds, 2),
+                "disk_mb": round(disk_bytes / 1e6, 1),
+                "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+                "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+                f"recall@{args.top_k}": round(recall, 4),
+            }
+            rows.append(row)
+            print(
+                f"size={size:>7} search_ef={search_ef:>4}  build={row['build_s']:>7}s  "
+                f"disk={row['disk_mb']:>7}MB  p50={row['p50_ms']:>6}ms  p95={row['p95_ms']:>6}ms  "
+                f"recall@{args.top_k}={row[f'recall@{args.top_k}']}"
+            )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"settings": vars(args), "results": rows}, f, indent=2)
+        print(f"Results written to {args.output}")
+    return rows
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark Chroma HNSW settings on synthetic corpora")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000], help="Corpus sizes")
+    parser.add_argument("--dim", type=int, default=384, help="Vector dimension (all-MiniLM-L6-v2: 384)")
+    parser.add_argument("--clusters", type=int, default=50, help="Topic clusters in the synthetic corpus")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per configuration")
+    parser.add_argument("--top-k", type=int, default=2, help="Results per query (recall@k)")
+    parser.add_argument("--space", choices=["l2", "cosine", "ip"], default="l2", help="hnsw:space")
+    parser.add_argument("--m", type=int, default=16, help="hnsw:M")
+    parser.add_argument("--construction-ef", type=int, default=100, help="hnsw:construction_ef")
+    parser.add_argument("--search-ef", type=int, nargs="+", default=[10, 50, 100], help="hnsw:search_ef values")
+    parser.add_argument("--hnsw-batch-size", type=int, default=100, help="hnsw:batch_size")
+    parser.add_argument("--sync-threshold", type=int, default=1000, help="hnsw:sync_threshold")
+    parser.add_argument("--add-batch-size", type=int, default=1000, help="Embeddings per collection.add call")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    run(parse_args())
@@ -0,0 +1,120 @@
+"""
+Document reading and chunking for the basic RAG system
+
+Kept apart from basic_rag.py so the indexing process pool can import the
+parse functions in spawned workers without loading Streamlit, Chroma or the
+embedding model.
+"""
+import PyPDF2
+import docx
+import os
+from typing import Iterable, Union
+
+
+def read_txt_files(file_path: str):
+    """Reads text files line by line"""
+    
+    with open(file_path, "r") as f:
+        yield from f
+    
+def read_pdf_file(file_path: str):
+    """Read pdf files one page at a time"""
+    with open(file_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        for page in pdf_reader.pages:
+            yield (page.extract_text() or "") + "\n"
+    
+
+def read_docx_file(file_path: str):
+    """Read word file paragraph by paragraph"""
+    doc = docx.Document(file_path)
+    for paragraph in doc.paragraphs:
+        yield paragraph.text + "\n"
+
+
+def read_files(file_path: str):
+    """Stream the text of a document (pages, lines or paragraphs) based on type"""
+    
+    _, file_extension = os.path.splitext(file_path)
+      
+    if file_extension == '.txt':
+        return read_txt_files(file_path)
+    elif file_extension == '.pdf':
+        return read_pdf_file(file_path)
+    elif file_extension == '.docx':
+        return read_docx_file(file_path)
+    return iter(())
+
+
+def _cut(text: str, max_length: int):
+    """Split off a prefix of at most max_length characters, at the last space if there is one"""
+    cut = text.rfind(' ', 0, max_length + 1)
+    if cut <= 0:
+        cut = max_length
+    return text[:cut], text[cut:]
+
+
+def iter_sentences(pieces: Iterable[str], max_length: int = 500):
+    """
+    Split streamed text into (sentence, complete) pairs; a sentence may span
+    pieces (e.g. pages). Text without ". " (lists, tables) and overlong
+    sentences are cut into fragments of at most max_length characters
+    (complete=False), so neither the carried-over text nor a chunk grows
+    without bound.
+    """
+    remainder = ""
+    for piece in pieces:
+        remainder += piece.replace('\n', ' ')
+        *sentences, remainder = remainder.split('. ')
+        for sentence in sentences:
+            while len(sentence) > max_length:
+                fragment, sentence = _cut(sentence, max_length)
+                yield fragment, False
+            yield sentence, True
+        # Keep the carried-over text bounded; its tail may still end in ". "
+        while len(remainder) > max_length:
+            fragment, remainder = _cut(remainder, max_length)
+            yield fragment, False
+    if remainder:
+        yield remainder, True
+
+
+def split_text(text: Union[str, Iterable[str]], chunk_size: int = 500):
+    """Split text (a string or a stream of pieces) into chunks while preserving sentence boundaries"""
+    if isinstance(text, str):
+        text = [text]
+    current_chunk = []
+    current_size = 0
+
+    for sentence, complete in iter_sentences(text, chunk_size):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+
+        if complete and not sentence.endswith('.'):
+            sentence += '.'
+
+        sentence_size = len(sentence)
+
+        if current_size + sentence_size > chunk_size and current_chunk:
+            yield ' '.join(current_chunk)
+            current_chunk = [sentence]
+            current_size = sentence_size
+        else:
+            current_chunk.append(sentence)
+            current_size += sentence_size
+
+    if current_chunk:
+        yield ' '.join(current_chunk)
+
+
+def process_document(file_path: str):
+    """Stream (id, chunk, metadata) records of a single document"""
+    file_name = os.path.basename(file_path)
+    for i, chunk in enumerate(split_text(read_files(file_path))):
+        yield f"{file_name}_chunk_{i}", chunk, {"source": file_name, "chunk": i}
+
+
+def parse_document(file_path: str):
+    """Parse and chunk a document in a worker process"""
+    return list(process_document(file_path))
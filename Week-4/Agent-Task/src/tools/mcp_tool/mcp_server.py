@@ -22,8 +22,13 @@ SCOPES = [
     'https://www.googleapis.com/auth/drive.readonly'
 ]
 
-def get_google_services():
-    """Authenticate and return Google Docs and Drive services"""
+def get_google_services(interactive: bool = True):
+    """
+    Authenticate and return Google Docs and Drive services
+
+    With interactive=False, a missing or unrefreshable token raises instead of
+    starting the browser OAuth flow (for callers outside the MCP server).
+    """
     creds = None
     
     # Check for existing token
@@ -35,6 +40,8 @@ def get_google_services():
     if not creds or not creds.valid:
         if creds and creds.expired and creds.refresh_token:
             creds.refresh(Request())
+        elif not interactive:
+            raise RuntimeError("No valid Google token; run the MCP server once to authorize")
         else:
             flow = InstalledAppFlow.from_client_secrets_file(
                 'src/tools/mcp_tool/credentials.json', SCOPES)
@@ -117,6 +124,21 @@ def get_document_content_by_type(docs_service, drive_service, file_id, mime_type
         return "[Unsupported document type]"
 
 
+def drive_modified_times(file_ids):
+    """Return {file_id: modifiedTime} for the given Drive files, used for cache invalidation"""
+    # Runs in the agent process: never open a browser for OAuth here
+    _, drive_service = get_google_services(interactive=False)
+    versions = {}
+    for file_id in file_ids:
+        try:
+            metadata = drive_service.files().get(fileId=file_id, fields='modifiedTime').execute()
+            versions[file_id] = metadata.get('modifiedTime', '')
+        except Exception:
+            # Deleted or no longer shared, treat as changed
+            versions[file_id] = ''
+    return versions
+
+
 @mcp.tool()
 def list_recent_docs(count: int = 15) -> str:
     """
@@ -192,7 +214,7 @@ def search_and_retrieve(query: str) -> str:
         results = drive_service.files().list(
             q=drive_query,
             spaces='drive',
-            fields='files(id, name, mimeType)',
+            fields='files(id, name, mimeType, modifiedTime)',
             pageSize=1,
             orderBy='modifiedTime desc'
         ).execute()
@@ -214,7 +236,12 @@ def search_and_retrieve(query: str) -> str:
         
         file_type = "Google Doc" if mime_type == 'application/vnd.google-apps.document' else "DOCX"
         
-        return f"=== {doc_name} [{file_type}] ===\nDocument ID: {doc_id}\n\n{content}"
+        modified_time = files[0].get('modifiedTime', 'Unknown')
+
+        return (
+            f"=== {doc_name} [{file_type}] ===\nDocument ID: {doc_id}\n"
+            f"Last Modified: {modified_time}\n\n{content}"
+        )
     
     except Exception as e:
         return f"Error in search and retrieval: {str(e)}"
@@ -0,0 +1,184 @@
+"""
+COPY-based bulk writes into langchain_pg_embedding
+
+PGVector inserts through the ORM in batches; for a first load of a large
+document set that is dominated by per-row overhead. CopyBulkWriter streams
+precomputed embeddings with COPY instead, writing exactly the columns PGVector
+reads (id, collection_id, embedding, document, cmetadata). COPY has no
+conflict handling, so each batch is copied into a transaction-local staging
+table and upserted from there: re-running a load that was interrupted
+rewrites the rows it already copied instead of failing on the primary key.
+deferred_indexes() drops the collection's ANN indexes for the duration of the
+load and rebuilds them once the rows are in.
+"""
+import csv
+import io
+import json
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+from src.tools.rag_tool.pg_pool import PgConnectionManager, to_vector_literal
+
+STAGE_SQL = """
+    CREATE TEMP TABLE rag_copy_stage (LIKE langchain_pg_embedding INCLUDING DEFAULTS) ON COMMIT DROP
+"""
+
+COPY_SQL = """
+    COPY rag_copy_stage (id, collection_id, embedding, document, cmetadata)
+    FROM STDIN WITH (FORMAT csv)
+"""
+
+UPSERT_SQL = """
+    INSERT INTO langchain_pg_embedding (id, collection_id, embedding, document, cmetadata)
+    SELECT DISTINCT ON (id) id, collection_id, embedding, document, cmetadata FROM rag_copy_stage
+    ON CONFLICT (id) DO UPDATE SET
+        collection_id = EXCLUDED.collection_id,
+        embedding = EXCLUDED.embedding,
+        document = EXCLUDED.document,
+        cmetadata = EXCLUDED.cmetadata
+"""
+
+
+class CopyBulkWriter:
+    """Drop-in for vectorstore.add_embeddings that writes with COPY"""
+
+    def __init__(self, db: PgConnectionManager, collection_id: str):
+        """
+        Initialize the writer
+
+        Args:
+            db: Shared connection manager
+            collection_id: UUID of the target collection in langchain_pg_collection
+        """
+        self.db = db
+        self.collection_id = collection_id
+        self.rows_copied = 0
+        self.seconds = 0.0
+
+    def add_embeddings(
+        self,
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        ids: Optional[List[str]] = None,
+    ) -> List[str]:
+        """Copy one batch of rows, replacing existing ids; same arguments as PGVector.add_embeddings"""
+        metadatas = metadatas or [{} for _ in texts]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, quoting=csv.QUOTE_ALL, lineterminator="\n")
+        for row_id, text, vector, metadata in zip(ids, texts, embeddings, metadatas):
+            writer.writerow([
+                row_id,
+                self.collection_id,
+                to_vector_literal(vector),
+                # Postgres text cannot hold NUL bytes
+                text.replace("\x00", ""),
+                json.dumps(metadata, default=str),
+            ])
+        buffer.seek(0)
+
+        start = time.perf_counter()
+        # One transaction: the staging table is dropped on commit
+        with self.db.cursor() as cursor:
+            cursor.execute(STAGE_SQL)
+            cursor.copy_expert(COPY_SQL, buffer)
+            cursor.execute(UPSERT_SQL)
+        self.seconds += time.perf_counter() - start
+        self.rows_copied += len(texts)
+        return list(ids)
+
+
+def _ensure_deferred_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS rag_deferred_index (
+            name TEXT PRIMARY KEY,
+            definition TEXT NOT NULL,
+            dropped_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    """)
+
+
+def restore_deferred_indexes(db: PgConnectionManager, index_names: Sequence[str]) -> List[str]:
+    """
+    Recreate indexes a bulk load dropped but never rebuilt (e.g. the process
+    was killed mid-load) from the definitions saved in rag_deferred_index
+
+    Returns:
+        Names of the restored indexes
+    """
+    with db.cursor() as cursor:
+        _ensure_deferred_table(cursor)
+        cursor.execute(
+            "SELECT name, definition FROM rag_deferred_index WHERE name = ANY(%s)", (list(index_names),)
+        )
+        leftovers = cursor.fetchall()
+    restored = []
+    for name, definition in leftovers:
+        with db.cursor() as cursor:
+            cursor.execute("SELECT to_regclass(%s)", (name,))
+            if cursor.fetchone()[0] is None:
+                cursor.execute(definition)
+            cursor.execute("DELETE FROM rag_deferred_index WHERE name = %s", (name,))
+        restored.append(name)
+    if restored:
+        print(f"✓ Restored {len(restored)} indexes left dropped by an interrupted bulk load")
+    return restored
+
+
+@contextmanager
+def deferred_indexes(
+    db: PgConnectionManager,
+    index_names: Sequence[str],
+    maintenance_work_mem: Optional[str] = "512MB",
+) -> Iterator[List[str]]:
+    """
+    Drop the given indexes of langchain_pg_embedding (the loading collection's
+    partial ANN indexes) for the duration of a bulk load and recreate them
+    afterwards, even if the load fails.
+
+    The table is shared by every collection, so only this collection's own
+    indexes are dropped; other collections' ANN indexes and the shared
+    metadata / full-text indexes stay. Definitions are saved in
+    rag_deferred_index in the same transaction as the drop, so a killed load
+    is repaired by restore_deferred_indexes.
+
+    Args:
+        db: Shared connection manager
+        index_names: Names of the indexes to defer, e.g. VectorIndexManager.index_names()
+        maintenance_work_mem: Memory for the index builds (None = server default)
+
+    Yields:
+        Names of the dropped indexes
+    """
+    restore_deferred_indexes(db, index_names)
+    with db.cursor() as cursor:
+        cursor.execute("""
+            SELECT i.relname, pg_get_indexdef(i.oid)
+            FROM pg_index x
+            JOIN pg_class i ON i.oid = x.indexrelid
+            WHERE x.indrelid = 'langchain_pg_embedding'::regclass
+              AND NOT x.indisprimary AND NOT x.indisunique
+              AND i.relname = ANY(%s)
+        """, (list(index_names),))
+        definitions = cursor.fetchall()
+        cursor.executemany(
+            "INSERT INTO rag_deferred_index (name, definition) VALUES (%s, %s)", definitions
+        )
+        for name, _ in definitions:
+            cursor.execute(f'DROP INDEX IF EXISTS "{name}"')
+    if definitions:
+        print(f"✓ Dropped {len(definitions)} indexes for the bulk load")
+
+    try:
+        yield [name for name, _ in definitions]
+    finally:
+        start = time.perf_counter()
+        for name, definition in definitions:
+            with db.cursor() as cursor:
+                if maintenance_work_mem:
+                    cursor.execute(f"SET LOCAL maintenance_work_mem = '{maintenance_work_mem}'")
+                cursor.execute(definition)
+                cursor.execute("DELETE FROM rag_deferred_index WHERE name = %s", (name,))
+        with db.cursor() as cursor:
+            cursor.execute("ANALYZE langchain_pg_embedding")
+        print(f"✓ Rebuilt {len(definitions)} indexes in {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,115 @@
+"""
+Near-duplicate chunk detection with MinHash + LSH
+
+The HR policies ship as TXT, DOCX and PDF copies of the same text, so the
+same passage is chunked (at slightly different boundaries) once per copy.
+Chunks are compared by the Jaccard similarity of their word shingles,
+estimated from MinHash signatures; LSH banding keeps lookups sub-linear.
+Detection runs before embedding, so duplicates cost neither embedding
+requests nor index space.
+"""
+import hashlib
+import re
+from typing import Dict, List, Optional, Set
+import numpy as np
+
+# Mersenne prime for the universal hash family (a * x + b) mod p
+_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_WORD = re.compile(r"\w+")
+
+
+class MinHashDeduplicator:
+    """Index of chunk signatures answering "is this text a near-duplicate of a known chunk?" """
+
+    def __init__(
+        self,
+        threshold: float = 0.8,
+        num_perm: int = 128,
+        bands: int = 32,
+        shingle_size: int = 3,
+        seed: int = 1,
+    ):
+        """
+        Initialize the deduplicator
+
+        Args:
+            threshold: Estimated Jaccard similarity at which two chunks are duplicates
+            num_perm: MinHash permutations (signature length)
+            bands: LSH bands; num_perm / bands rows each. More bands find
+                candidates at lower similarity at the cost of more comparisons
+            shingle_size: Words per shingle
+            seed: Seed for the permutation coefficients (fixed so runs agree)
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 1 << 31, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 31, size=num_perm, dtype=np.uint64)
+        self.signatures: Dict[str, np.ndarray] = {}
+        self.buckets: List[Dict[bytes, Set[str]]] = [{} for _ in range(bands)]
+
+    def _shingles(self, text: str) -> Set[str]:
+        # Case, punctuation and line breaks differ between PDF/DOCX/TXT extracts
+        words = _WORD.findall(text.lower())
+        if len(words) < self.shingle_size:
+            return {" ".join(words)}
+        return {" ".join(words[i:i + self.shingle_size]) for i in range(len(words) - self.shingle_size + 1)}
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature of a text's word shingles"""
+        hashes = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(s.encode(), digest_size=4).digest(), "little")
+             for s in self._shingles(text)),
+            dtype=np.uint64,
+        )
+        # (num_perm, shingles) permuted hashes, minimum per permutation
+        permuted = (np.outer(self._a, hashes) + self._b[:, None]) % _PRIME & _MAX_HASH
+        return permuted.min(axis=1)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def add(self, key: str, text: str, signature: Optional[np.ndarray] = None):
+        """Register a kept chunk under its id"""
+        signature = self.signature(text) if signature is None else signature
+        self.signatures[key] = signature
+        for bucket, band in zip(self.buckets, self._band_keys(signature)):
+            bucket.setdefault(band, set()).add(key)
+
+    def remove(self, key: str):
+        signature = self.signatures.pop(key, None)
+        if signature is None:
+            return
+        for bucket, band in zip(self.buckets, self._band_keys(signature)):
+            bucket.get(band, set()).discard(key)
+
+    def find(self, text: str, signature: Optional[np.ndarray] = None) -> Optional[str]:
+        """Id of the most similar known chunk at or above the threshold, else None"""
+        signature = self.signature(text) if signature is None else signature
+        candidates: Set[str] = set()
+        for bucket, band in zip(self.buckets, self._band_keys(signature)):
+            candidates |= bucket.get(band, set())
+
+        best, best_similarity = None, self.threshold
+        for key in candidates:
+            similarity = float(np.mean(self.signatures[key] == signature))
+            if similarity >= best_similarity:
+                best, best_similarity = key, similarity
+        return best
+
+    def find_or_add(self, key: str, text: str) -> Optional[str]:
+        """Return the duplicate's id, or register the text under key and return None"""
+        signature = self.signature(text)
+        duplicate = self.find(text, signature)
+        if duplicate is None:
+            self.add(key, text, signature)
+        return duplicate
+
+    def __len__(self) -> int:
+        return len(self.signatures)
@@ -0,0 +1,96 @@
+"""
+Bounded LRU cache for query embeddings
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace and case so trivially different queries share an embedding"""
+    return " ".join(text.lower().split())
+
+
+class CachedQueryEmbeddings:
+    """
+    Wraps a LangChain embeddings model and caches `embed_query` results.
+
+    Entries are keyed by (model name, normalized text) and evicted least
+    recently used first. `embed_documents` is passed through untouched since
+    ingestion never embeds the same chunk twice.
+    """
+
+    def __init__(self, embeddings: Any, model_name: str, max_entries: int = 2048):
+        """
+        Initialize the query embedding cache
+
+        Args:
+            embeddings: Underlying embeddings model (e.g. OllamaEmbeddings)
+            model_name: Model name, part of the cache key
+            max_entries: Maximum cached query vectors
+        """
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.cache: "OrderedDict[Tuple[str, str], List[float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def embed_query(self, text: str) -> List[float]:
+        """Return the cached embedding for a query, embedding it on a miss"""
+        normalized = normalize_text(text)
+        key = (self.model_name, normalized)
+        with self._lock:
+            vector = self.cache.get(key)
+            if vector is not None:
+                self.cache.move_to_end(key)
+                self.hits += 1
+                return vector
+            self.misses += 1
+
+        vector = self.embeddings.embed_query(normalized)
+        self._store(key, vector)
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Async variant of embed_query"""
+        normalized = normalize_text(text)
+        key = (self.model_name, normalized)
+        with self._lock:
+            vector = self.cache.get(key)
+            if vector is not None:
+                self.cache.move_to_end(key)
+                self.hits += 1
+                return vector
+            self.misses += 1
+
+        vector = await self.embeddings.aembed_query(normalized)
+        self._store(key, vector)
+        return vector
+
+    def _store(self, key: Tuple[str, str], vector: List[float]):
+        with self._lock:
+            self.cache[key] = vector
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.max_entries:
+                self.cache.popitem(last=False)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return size and hit-rate metrics"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.cache),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self.cache.clear()
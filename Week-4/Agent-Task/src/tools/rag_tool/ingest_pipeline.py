@@ -0,0 +1,270 @@
+"""
+Pipelined document ingestion for the pgVector RAG tool
+
+parse (process pool) -> embed (bounded concurrent batches) -> write (batched)
+
+Each stage runs concurrently with the others: files are parsed and split in
+worker processes, their chunks stream into embedding requests as soon as a
+file is ready, and a writer thread batches finished embeddings into Postgres.
+At most `max_in_flight` embedding batches are outstanding at once, so a slow
+database or Ollama host applies backpressure to the stages before it.
+"""
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from langchain_community.document_loaders import PyPDFLoader, TextLoader, Docx2txtLoader
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+
+# Loader per supported file type
+LOADERS = {
+    ".pdf": PyPDFLoader,
+    ".txt": TextLoader,
+    ".docx": Docx2txtLoader,
+}
+
+SEPARATORS = ["\n\n", "\n", ". ", " ", ""]
+
+# Bump when the chunk metadata schema changes so existing files are re-indexed
+INGEST_VERSION = "4"
+
+EFFECTIVE_DATE_PATTERN = re.compile(r"effective(?:\s+date)?\s*[:\-]?\s*(\d{4}-\d{2}-\d{2})", re.IGNORECASE)
+
+
+def document_metadata(source: str, text: str) -> Dict[str, str]:
+    """
+    Filterable metadata stamped on every chunk of a file: file name, document
+    type and, when the text states one ("Effective Date: YYYY-MM-DD"), the
+    effective date. Undated files get no effective_date, so date filters
+    exclude them rather than matching on when the file was last saved.
+    """
+    path = Path(source)
+    metadata = {
+        "file_name": path.name,
+        "doc_type": path.suffix.lower().lstrip("."),
+    }
+    match = EFFECTIVE_DATE_PATTERN.search(text)
+    if match:
+        metadata["effective_date"] = match.group(1)
+    return metadata
+
+
+def load_and_split(source: str, chunk_size: int = 1000, chunk_overlap: int = 200) -> List[Document]:
+    """Load a single document and split it into chunks (runs in a worker process)"""
+    loader_cls = LOADERS[Path(source).suffix.lower()]
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        separators=SEPARATORS
+    )
+    documents = loader_cls(source).load()
+    metadata = document_metadata(source, "\n".join(doc.page_content for doc in documents))
+    for doc in documents:
+        doc.metadata.update(metadata)
+    return text_splitter.split_documents(documents)
+
+
+# A planned chunk: the document and the id it is stored under
+PlannedChunk = Tuple[Document, str]
+
+
+class PipelinedIngester:
+    """Parses, embeds and writes documents with overlapping stages"""
+
+    def __init__(
+        self,
+        embeddings: Any,
+        vectorstore: Any,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 200,
+        parse_workers: Optional[int] = None,
+        embed_workers: int = 4,
+        embed_batch_size: int = 32,
+        max_in_flight: int = 8,
+        write_batch_size: int = 256,
+    ):
+        """
+        Initialize the ingester
+
+        Args:
+            embeddings: LangChain embeddings model used for embed_documents
+            vectorstore: PGVector store receiving add_embeddings calls
+            chunk_size: Characters per chunk
+            chunk_overlap: Overlap between chunks
+            parse_workers: Processes for PDF/DOCX parsing (defaults to CPU count)
+            embed_workers: Concurrent embedding requests
+            embed_batch_size: Chunks per embedding request
+            max_in_flight: Embedding batches allowed between parse and write
+            write_batch_size: Rows per vectorstore write
+        """
+        self.embeddings = embeddings
+        self.vectorstore = vectorstore
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.parse_workers = parse_workers or os.cpu_count() or 2
+        self.embed_workers = embed_workers
+        self.embed_batch_size = embed_batch_size
+        self.max_in_flight = max_in_flight
+        self.write_batch_size = write_batch_size
+
+    def run(
+        self,
+        sources: List[str],
+        plan: Callable[[str, List[Document]], List[PlannedChunk]],
+        on_file_written: Callable[[str], None],
+        writer: Any = None,
+        write_batch_size: Optional[int] = None,
+    ) -> Dict[str, float]:
+        """
+        Ingest the given files
+
+        Args:
+            sources: File paths to parse
+            plan: Called with (source, chunks) once a file is parsed; returns the
+                chunks that still need embedding together with their ids
+            on_file_written: Called once every planned chunk of a file is stored
+            writer: Object with add_embeddings(texts, embeddings, metadatas, ids);
+                defaults to the vector store (e.g. a CopyBulkWriter for bulk loads)
+            write_batch_size: Rows per write for this run (defaults to the ingester's)
+
+        Returns:
+            Throughput report (docs/s, chunks/s, embeddings/s and stage counts)
+        """
+        report = {"docs": 0, "chunks": 0, "embeddings": 0, "rows_written": 0}
+        writer = writer or self.vectorstore
+        write_batch_size = write_batch_size or self.write_batch_size
+        in_flight = threading.BoundedSemaphore(self.max_in_flight)
+        write_queue: "queue.Queue[Optional[Tuple[str, List[PlannedChunk], List[List[float]]]]]" = queue.Queue()
+        pending: Dict[str, int] = {}
+        pending_lock = threading.Lock()
+        errors: List[BaseException] = []
+        start = time.perf_counter()
+
+        def finish_batch(source: str, count: int):
+            with pending_lock:
+                pending[source] -= count
+                done = pending[source] == 0
+            if done:
+                on_file_written(source)
+
+        def write_loop():
+            buffer: List[Tuple[str, PlannedChunk, List[float]]] = []
+
+            def flush():
+                if not buffer:
+                    return
+                writer.add_embeddings(
+                    texts=[doc.page_content for _, (doc, _), _ in buffer],
+                    embeddings=[vector for _, _, vector in buffer],
+                    metadatas=[doc.metadata for _, (doc, _), _ in buffer],
+                    ids=[chunk_id for _, (_, chunk_id), _ in buffer],
+                )
+                report["rows_written"] += len(buffer)
+                counts: Dict[str, int] = {}
+                for source, _, _ in buffer:
+                    counts[source] = counts.get(source, 0) + 1
+                buffer.clear()
+                for source, count in counts.items():
+                    finish_batch(source, count)
+
+            while True:
+                item = write_queue.get()
+                if item is None:
+                    break
+                source, batch, vectors = item
+                try:
+                    if not errors:
+                        buffer.extend((source, chunk, vector) for chunk, vector in zip(batch, vectors))
+                        if len(buffer) >= write_batch_size:
+                            flush()
+                except BaseException as e:
+                    errors.append(e)
+                finally:
+                    in_flight.release()
+            try:
+                if not errors:
+                    flush()
+            except BaseException as e:
+                errors.append(e)
+
+        def embed(source: str, batch: List[PlannedChunk]):
+            try:
+                vectors = self.embeddings.embed_documents([doc.page_content for doc, _ in batch])
+                with pending_lock:
+                    report["embeddings"] += len(vectors)
+                write_queue.put((source, batch, vectors))
+            except BaseException as e:
+                errors.append(e)
+                in_flight.release()
+
+        writer_thread = threading.Thread(target=write_loop, name="pgvector-writer", daemon=True)
+        futures = {}
+        try:
+            with ProcessPoolExecutor(max_workers=self.parse_workers) as parse_pool, \
+                    ThreadPoolExecutor(max_workers=self.embed_workers) as embed_pool:
+                try:
+                    # Parse jobs go first so the worker processes fork before
+                    # the embedding and writer threads exist
+                    for source in sources:
+                        if Path(source).suffix.lower() != ".txt":
+                            futures[parse_pool.submit(load_and_split, source, self.chunk_size, self.chunk_overlap)] = source
+                    # Text files are cheap to parse; keep them out of the process pool
+                    for source in sources:
+                        if Path(source).suffix.lower() == ".txt":
+                            futures[embed_pool.submit(load_and_split, source, self.chunk_size, self.chunk_overlap)] = source
+                    writer_thread.start()
+
+                    for future in as_completed(futures):
+                        if errors:
+                            break
+                        source = futures[future]
+                        try:
+                            splits = future.result()
+                        except Exception as e:
+                            print(f"  Failed to parse {source}: {e}")
+                            continue
+                        report["docs"] += 1
+                        report["chunks"] += len(splits)
+
+                        planned = plan(source, splits)
+                        if not planned:
+                            on_file_written(source)
+                            continue
+                        with pending_lock:
+                            pending[source] = len(planned)
+
+                        for i in range(0, len(planned), self.embed_batch_size):
+                            # Blocks when max_in_flight batches are waiting: backpressure
+                            in_flight.acquire()
+                            if errors:
+                                in_flight.release()
+                                break
+                            embed_pool.submit(embed, source, planned[i:i + self.embed_batch_size])
+                finally:
+                    for future in futures:
+                        future.cancel()
+        finally:
+            # Embedding pool is drained on exit (also when plan or on_file_written
+            # raised); tell the writer nothing else is coming
+            if writer_thread.ident is not None:
+                write_queue.put(None)
+                writer_thread.join()
+
+        if errors:
+            raise errors[0]
+
+        elapsed = time.perf_counter() - start
+        report["seconds"] = round(elapsed, 2)
+        report["docs_per_s"] = round(report["docs"] / elapsed, 2) if elapsed else 0.0
+        report["chunks_per_s"] = round(report["chunks"] / elapsed, 2) if elapsed else 0.0
+        report["embeddings_per_s"] = round(report["embeddings"] / elapsed, 2) if elapsed else 0.0
+        print(
+            f"✓ Ingest throughput: {report['docs_per_s']} docs/s, {report['chunks_per_s']} chunks/s, "
+            f"{report['embeddings_per_s']} embeddings/s ({report['seconds']}s)"
+        )
+        return report
@@ -0,0 +1,395 @@
+"""
+In-process vector backend: embeddings in a memory-mapped NumPy matrix
+
+Drop-in for the pgVector tool on dev boxes and in tests (no Postgres needed)
+and a baseline to benchmark the pgvector path against. Search is exact: one
+matrix-vector product plus argpartition for the top k.
+
+On disk a store is a directory with
+    embeddings.npy  float32 (rows, dim) matrix, opened with mmap_mode="r"
+    chunks.json     ids, texts, metadata and the file manifest
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from langchain_ollama import OllamaEmbeddings
+from langchain_core.documents import Document
+from src.tools.rag_tool.embedding_cache import CachedQueryEmbeddings
+from src.tools.rag_tool.ingest_pipeline import PipelinedIngester
+from src.tools.rag_tool.rag_base import BaseRAGTool, calibrate_distance, latency_summary
+
+METRICS = ("cosine", "l2")
+
+
+class NumpyVectorStore:
+    """
+    Exact nearest-neighbour store over a NumPy matrix, persisted to a directory.
+
+    Writes (add_embeddings / delete) rebuild the matrix in memory; save()
+    writes it back and re-opens it memory-mapped, so a large persisted store
+    costs no RAM until searches page it in.
+    """
+
+    def __init__(self, path: str, metric: str = "cosine"):
+        """
+        Initialize the store, loading it from disk if present
+
+        Args:
+            path: Directory holding embeddings.npy and chunks.json
+            metric: "cosine" or "l2"
+        """
+        if metric not in METRICS:
+            raise ValueError(f"Unsupported metric: {metric}")
+        self.path = Path(path)
+        self.metric = metric
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+        self.ids: List[str] = []
+        self.texts: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self.files: Dict[str, str] = {}
+        self._norms = np.zeros(0, dtype=np.float32)
+        self._lock = threading.Lock()
+        self.load()
+
+    @property
+    def matrix_file(self) -> Path:
+        return self.path / "embeddings.npy"
+
+    @property
+    def chunks_file(self) -> Path:
+        return self.path / "chunks.json"
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _refresh_norms(self):
+        # Squared norms for L2, plain norms for cosine; computed once per write
+        squared = np.einsum("ij,ij->i", self.matrix, self.matrix) if len(self.matrix) else np.zeros(0)
+        self._norms = (squared if self.metric == "l2" else np.sqrt(squared)).astype(np.float32)
+
+    def load(self):
+        """Open a persisted store (memory-mapped); a missing store starts empty"""
+        if not self.chunks_file.exists() or not self.matrix_file.exists():
+            return
+        with open(self.chunks_file, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("metric", self.metric) != self.metric:
+            raise ValueError(f"Store at {self.path} uses {data['metric']}, not {self.metric}")
+        with self._lock:
+            self.matrix = np.load(self.matrix_file, mmap_mode="r")
+            self.ids = data["ids"]
+            self.texts = data["texts"]
+            self.metadatas = data["metadatas"]
+            self.files = data.get("files", {})
+            self._refresh_norms()
+
+    def save(self):
+        """Write the matrix and chunk data atomically, then re-open memory-mapped"""
+        self.path.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            np.save(self.path / "embeddings.tmp.npy", np.ascontiguousarray(self.matrix, dtype=np.float32))
+            with open(self.path / "chunks.tmp.json", "w", encoding="utf-8") as f:
+                json.dump({
+                    "metric": self.metric,
+                    "ids": self.ids,
+                    "texts": self.texts,
+                    "metadatas": self.metadatas,
+                    "files": self.files,
+                }, f)
+            os.replace(self.path / "embeddings.tmp.npy", self.matrix_file)
+            os.replace(self.path / "chunks.tmp.json", self.chunks_file)
+            self.matrix = np.load(self.matrix_file, mmap_mode="r")
+
+    def add_embeddings(
+        self,
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        ids: Optional[List[str]] = None,
+    ) -> List[str]:
+        """Append rows; same arguments as PGVector.add_embeddings"""
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        with self._lock:
+            self.matrix = vectors if not len(self.ids) else np.vstack([self.matrix, vectors])
+            self.ids.extend(ids)
+            self.texts.extend(texts)
+            self.metadatas.extend(metadatas or [{} for _ in texts])
+            self._refresh_norms()
+        return list(ids)
+
+    def delete(self, ids: List[str]):
+        """Remove rows by id"""
+        drop = set(ids)
+        with self._lock:
+            keep = [i for i, row_id in enumerate(self.ids) if row_id not in drop]
+            if len(keep) == len(self.ids):
+                return
+            self.matrix = np.asarray(self.matrix[keep], dtype=np.float32)
+            self.ids = [self.ids[i] for i in keep]
+            self.texts = [self.texts[i] for i in keep]
+            self.metadatas = [self.metadatas[i] for i in keep]
+            self._refresh_norms()
+
+    def clear(self):
+        with self._lock:
+            self.matrix = np.zeros((0, 0), dtype=np.float32)
+            self.ids, self.texts, self.metadatas, self.files = [], [], [], {}
+            self._norms = np.zeros(0, dtype=np.float32)
+
+    @staticmethod
+    def _matches(metadata: Dict[str, Any], filters: Dict[str, str]) -> bool:
+        """Same semantics as the pgVector tool's SQL filters"""
+        for key in ("file_name", "doc_type"):
+            if key in filters and metadata.get(key) != filters[key]:
+                return False
+        effective_date = metadata.get("effective_date")
+        if effective_date is None:
+            # Undated documents never match a date range (NULL in SQL)
+            return "effective_after" not in filters and "effective_before" not in filters
+        if "effective_after" in filters and effective_date < filters["effective_after"]:
+            return False
+        if "effective_before" in filters and effective_date > filters["effective_before"]:
+            return False
+        return True
+
+    def search(
+        self, embedding: List[float], k: int = 4, filters: Optional[Dict[str, str]] = None
+    ) -> List[Tuple[Document, float]]:
+        """
+        Exact top-k by cosine distance (1 - cosine similarity) or L2 distance
+
+        Returns:
+            (document, distance) pairs, closest first
+        """
+        with self._lock:
+            matrix, norms = self.matrix, self._norms
+            ids, texts, metadatas = self.ids, self.texts, self.metadatas
+        # Lists may grow after the lock is released; the matrix snapshot bounds the rows
+        rows = len(norms)
+        if not rows:
+            return []
+
+        query = np.asarray(embedding, dtype=np.float32)
+        dots = matrix @ query
+        if self.metric == "cosine":
+            distances = 1.0 - dots / np.maximum(norms * np.linalg.norm(query), 1e-12)
+        else:
+            distances = np.sqrt(np.maximum(norms - 2 * dots + query @ query, 0.0))
+
+        if filters:
+            mask = np.fromiter(
+                (self._matches(metadatas[i], filters) for i in range(rows)), dtype=bool, count=rows
+            )
+            distances = np.where(mask, distances, np.inf)
+
+        k = min(k, rows)
+        top = np.argpartition(distances, k - 1)[:k]
+        top = top[np.argsort(distances[top])]
+        return [
+            (Document(id=ids[i], page_content=texts[i], metadata=metadatas[i]), float(distances[i]))
+            for i in top
+            if np.isfinite(distances[i])
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "vectors": len(self.ids),
+            "dimension": int(self.matrix.shape[1]) if len(self.ids) else None,
+            "matrix_bytes": int(self.matrix.nbytes),
+            "memory_mapped": isinstance(self.matrix, np.memmap),
+        }
+
+
+class NumpyRAGTool(BaseRAGTool):
+    """HR policy RAG over an in-process NumpyVectorStore, same surface as PgVectorRAGTool"""
+
+    def __init__(
+        self,
+        store_path: str = "./.rag_store",
+        collection_name: str = "policies",
+        docs_directory: str = "./hr_policies",
+        model_name: str = "nomic-embed-text",
+        metric: str = "cosine",
+        parse_workers: int = None,
+        embed_workers: int = 4,
+        embed_batch_size: int = 32,
+        query_cache_size: int = 2048,
+        latency_window: int = 500,
+    ):
+        """
+        Initialize the NumPy RAG tool
+
+        Args:
+            store_path: Directory for persisted stores (one subdirectory per collection)
+            collection_name: Name of the collection
+            docs_directory: Directory containing HR policy documents
+            model_name: Ollama embedding model
+            metric: "cosine" or "l2"
+            parse_workers: Processes used to parse PDF/DOCX files during ingestion
+            embed_workers: Concurrent embedding requests during ingestion
+            embed_batch_size: Chunks per embedding request during ingestion
+            query_cache_size: Query embeddings kept in the LRU cache
+            latency_window: Recent search latencies kept for get_stats
+        """
+        self.collection_name = collection_name
+        self.docs_directory = docs_directory
+        self.model_name = model_name
+        self.embeddings = OllamaEmbeddings(model=model_name)
+        self.query_embeddings = CachedQueryEmbeddings(
+            self.embeddings, model_name, max_entries=query_cache_size
+        )
+        self.store = NumpyVectorStore(os.path.join(store_path, collection_name), metric=metric)
+        self._search_latencies: "deque[float]" = deque(maxlen=latency_window)
+
+        self.ingester = PipelinedIngester(
+            embeddings=self.embeddings,
+            vectorstore=self.store,
+            chunk_size=1000,
+            chunk_overlap=200,
+            parse_workers=parse_workers,
+            embed_workers=embed_workers,
+            embed_batch_size=embed_batch_size,
+        )
+
+        print(f"NumPy RAG Tool initialized with collection: {self.collection_name} ({len(self.store)} vectors)")
+
+    def load_and_vectorize_documents(self, force_reload: bool = False) -> Dict[str, Any]:
+        """
+        Load HR policy documents and create vector embeddings
+
+        Incremental like the pgVector tool: file hashes decide which files are
+        re-parsed and deterministic chunk ids decide which chunks are embedded.
+        The store is saved once at the end, so an interrupted run leaves the
+        previous state on disk.
+
+        Args:
+            force_reload: If True, drop the store and re-embed every document
+
+        Returns:
+            Counts of added, removed and unchanged chunks, plus a throughput report
+        """
+        summary: Dict[str, Any] = {"added": 0, "removed": 0, "unchanged": 0}
+        os.makedirs(self.docs_directory, exist_ok=True)
+        if force_reload:
+            self.store.clear()
+            print("✓ Cleared existing vectors")
+
+        current_files = self._scan_documents()
+        if not current_files:
+            print(f"⚠️  No documents found in {self.docs_directory}")
+            print("Please add PDF, TXT, or DOCX files to the directory.")
+
+        indexed_files = self.store.files
+        changed = [s for s, h in current_files.items() if indexed_files.get(s) != h]
+        deleted = [s for s in indexed_files if s not in current_files]
+
+        if not changed and not deleted:
+            print(f"✓ Collection up to date ({len(self.store)} vectors, {len(current_files)} files)")
+            summary["unchanged"] = len(self.store)
+            return summary
+
+        print(f"Indexing {len(changed)} new/changed and {len(deleted)} deleted files...")
+
+        def ids_of(source: str) -> List[str]:
+            return [
+                row_id for row_id, metadata in zip(self.store.ids, self.store.metadatas)
+                if metadata.get("source") == source
+            ]
+
+        for source in deleted:
+            stale_ids = ids_of(source)
+            self.store.delete(stale_ids)
+            del self.store.files[source]
+            summary["removed"] += len(stale_ids)
+            print(f"  Removed {len(stale_ids)} chunks of deleted file {source}")
+
+        def plan(source: str, splits: List[Document]) -> List[Tuple[Document, str]]:
+            """Diff a parsed file against the store; drop stale chunks, return new ones"""
+            new_ids = [embedding_id for embedding_id, _ in self._chunk_ids(source, splits)]
+            existing_ids = set(ids_of(source))
+            to_add = [(doc, embedding_id) for doc, embedding_id in zip(splits, new_ids) if embedding_id not in existing_ids]
+            to_remove = list(existing_ids - set(new_ids))
+            self.store.delete(to_remove)
+
+            summary["added"] += len(to_add)
+            summary["removed"] += len(to_remove)
+            summary["unchanged"] += len(splits) - len(to_add)
+            print(f"  {source}: +{len(to_add)} / -{len(to_remove)} chunks ({len(splits) - len(to_add)} unchanged)")
+            return to_add
+
+        def on_file_written(source: str):
+            self.store.files[source] = current_files[source]
+
+        summary["throughput"] = self.ingester.run(changed, plan, on_file_written)
+        self.store.save()
+
+        print(
+            f"✓ Indexed: {summary['added']} added, {summary['removed']} removed, "
+            f"{summary['unchanged']} unchanged chunks"
+        )
+        return summary
+
+    def similarity_search_by_vector(
+        self, embedding: List[float], k: int = 4, filters: Optional[Dict[str, str]] = None
+    ) -> List[Tuple[Document, float]]:
+        """Exact nearest chunks to an embedding as (document, distance) pairs"""
+        start = time.perf_counter()
+        results = self.store.search(embedding, k, filters)
+        self._search_latencies.append((time.perf_counter() - start) * 1000)
+        return results
+
+    def similarity_search(
+        self, query: str, k: int = 4, filters: Optional[Dict[str, str]] = None
+    ) -> List[Tuple[Document, float]]:
+        """Embed the query and return the nearest chunks with their distances"""
+        return self.similarity_search_by_vector(self.query_embeddings.embed_query(query), k, filters)
+
+    async def asimilarity_search(
+        self, query: str, k: int = 4, filters: Optional[Dict[str, str]] = None
+    ) -> List[Tuple[Document, float]]:
+        """Async variant of similarity_search; the matrix scan runs in a worker thread"""
+        embedding = await self.query_embeddings.aembed_query(query)
+        return await asyncio.to_thread(self.similarity_search_by_vector, embedding, k, filters)
+
+    def retrieve(
+        self, query: str, k: int = 8, filters: Optional[Dict[str, str]] = None
+    ) -> List[Tuple[Document, float]]:
+        return [
+            (doc, calibrate_distance(distance, self.store.metric))
+            for doc, distance in self.similarity_search(query, k=k, filters=filters)
+        ]
+
+    async def aretrieve(
+        self, query: str, k: int = 8, filters: Optional[Dict[str, str]] = None
+    ) -> List[Tuple[Document, float]]:
+        return [
+            (doc, calibrate_distance(distance, self.store.metric))
+            for doc, distance in await self.asimilarity_search(query, k=k, filters=filters)
+        ]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Store size, vectors per source, recent search latency and cache metrics"""
+        per_source: Dict[str, int] = {}
+        for metadata in self.store.metadatas:
+            source = metadata.get("source", "Unknown")
+            per_source[source] = per_source.get(source, 0) + 1
+        latencies = list(self._search_latencies)
+        return {
+            "collection_name": self.collection_name,
+            "backend": "numpy",
+            "metric": self.store.metric,
+            **self.store.stats(),
+            "vectors_per_source": per_source,
+            "search_latency": {"searches": len(latencies), **latency_summary(latencies)},
+            "query_embedding_cache": self.query_embeddings.stats(),
+        }
+
+    def health_check(self) -> Dict[str, Any]:
+        """In-process store: healthy once loaded"""
+        return {"healthy": True, "backend": "numpy", "vectors": len(self.store)}
@@ -0,0 +1,285 @@
+"""
+Backend-independent parts of the HR policy RAG tools: document scanning and
+chunk ids for incremental indexing, metadata filters, calibrated relevance
+with dynamic-k selection, result formatting and the search_policies tool surface
+"""
+import hashlib
+import json
+import os
+import statistics
+import uuid
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from langchain_core.documents import Document
+from langchain_core.tools import StructuredTool
+from src.tools.rag_tool.ingest_pipeline import INGEST_VERSION, LOADERS
+
+# Metadata that identifies a chunk. Loader extras (e.g. a PDF's moddate) change
+# on every save and would otherwise re-embed unchanged chunks.
+CHUNK_HASH_KEYS = ("source", "page", "file_name", "doc_type", "effective_date")
+
+
+def calibrate_distance(distance: float, metric: str) -> float:
+    """
+    Map a vector distance to a relevance in [0, 1] that means the same for
+    every metric: the cosine similarity. Ollama returns unit-length
+    nomic-embed-text vectors, so L2 and inner product convert exactly.
+    """
+    if metric == "cosine":
+        similarity = 1.0 - distance
+    elif metric == "l2":
+        similarity = 1.0 - distance * distance / 2.0
+    elif metric == "inner_product":
+        # pgvector's <#> is the negated inner product
+        similarity = -distance
+    else:
+        raise ValueError(f"Unsupported metric: {metric}")
+    return min(1.0, max(0.0, similarity))
+
+
+def hash_file(path: Path, salt: str = "") -> str:
+    """SHA-256 of a file's content, read in blocks, optionally mixed with a salt"""
+    digest = hashlib.sha256(salt.encode())
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def latency_summary(latencies: Iterable[float]) -> Dict[str, float]:
+    """Mean, p50 and p95 of latencies in ms; empty when there are none"""
+    ordered = sorted(latencies)
+    if not ordered:
+        return {}
+    return {
+        "mean_ms": round(statistics.mean(ordered), 2),
+        "p50_ms": round(ordered[len(ordered) // 2], 2),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+    }
+
+
+class BaseRAGTool(ABC):
+    """
+    Shared surface of the RAG backends. Subclasses set collection_name and
+    docs_directory and implement retrieve / aretrieve, which return
+    (document, relevance) pairs, best first, with relevance from
+    calibrate_distance. Hybrid backends rank by fused score, so relevance
+    need not decrease down the list; they flag full-text matches with
+    metadata["text_match"].
+    """
+
+    collection_name: str
+    docs_directory: str
+
+    # Dynamic-k selection for search_policies (see select_results)
+    min_relevance: float = 0.5
+    score_drop: float = 0.15
+    max_context_chars: int = 4000
+
+    @abstractmethod
+    def retrieve(
+        self, query: str, k: int = 8, filters: Optional[Dict[str, str]] = None
+    ) -> List[Tuple[Document, float]]:
+        """Up to k (document, relevance) pairs for a query, best first"""
+
+    @abstractmethod
+    async def aretrieve(
+        self, query: str, k: int = 8, filters: Optional[Dict[str, str]] = None
+    ) -> List[Tuple[Document, float]]:
+        """Async variant of retrieve"""
+
+    def configure_selection(
+        self,
+        min_relevance: Optional[float] = None,
+        score_drop: Optional[float] = None,
+        max_context_chars: Optional[int] = None,
+    ):
+        """
+        Tune dynamic-k selection
+
+        Args:
+            min_relevance: Cosine similarity a chunk needs to be returned
+            score_drop: Stop at the first result this much less relevant than the one before
+            max_context_chars: Budget for returned chunk text (~4 characters per token)
+        """
+        if min_relevance is not None:
+            self.min_relevance = min_relevance
+        if score_drop is not None:
+            self.score_drop = score_drop
+        if max_context_chars is not None:
+            self.max_context_chars = max_context_chars
+
+    def select_results(self, results: List[Tuple[Document, float]]) -> List[Tuple[Document, float]]:
+        """
+        Dynamic k over (document, relevance) pairs. Vector hits, taken in
+        order of relevance, are kept down to min_relevance or to the first
+        sharp drop (more than score_drop below the previous kept hit);
+        full-text matches are kept regardless, since lexical hits are exactly
+        the ones whose embeddings may be far off. The kept chunks stay in the
+        retrieval order and stop before the text exceeds max_context_chars;
+        the first chunk is truncated to the budget rather than dropped.
+        """
+        kept = set()
+        previous = None
+        vector_hits = [(i, relevance) for i, (doc, relevance) in enumerate(results)
+                       if not doc.metadata.get("text_match")]
+        for i, relevance in sorted(vector_hits, key=lambda hit: hit[1], reverse=True):
+            if relevance < self.min_relevance:
+                break
+            if previous is not None and previous - relevance > self.score_drop:
+                break
+            kept.add(i)
+            previous = relevance
+
+        selected: List[Tuple[Document, float]] = []
+        used = 0
+        for i, (doc, relevance) in enumerate(results):
+            if i not in kept and not doc.metadata.get("text_match"):
+                continue
+            if used + len(doc.page_content) > self.max_context_chars:
+                if not selected:
+                    truncated = Document(
+                        id=doc.id, page_content=doc.page_content[:self.max_context_chars], metadata=doc.metadata
+                    )
+                    selected.append((truncated, relevance))
+                break
+            selected.append((doc, relevance))
+            used += len(doc.page_content)
+        return selected
+
+    @staticmethod
+    def _hash_file(path: Path) -> str:
+        # Mixing in the ingest version re-indexes files when chunk metadata changes
+        return hash_file(path, salt=INGEST_VERSION)
+
+    def _scan_documents(self) -> Dict[str, str]:
+        """Map every supported file in docs_directory to its content hash"""
+        return {
+            str(path): self._hash_file(path)
+            for path in sorted(Path(self.docs_directory).glob("**/*"))
+            if path.is_file() and path.suffix.lower() in LOADERS
+        }
+
+    def _chunk_ids(self, source: str, splits: List[Document]) -> List[Tuple[str, str]]:
+        """
+        Deterministic (embedding_id, chunk_hash) per chunk, so an unchanged chunk
+        keeps its id (and its embedding) when other parts of the file change
+        """
+        seen: Dict[str, int] = {}
+        ids: List[Tuple[str, str]] = []
+        for doc in splits:
+            stable = {key: doc.metadata[key] for key in CHUNK_HASH_KEYS if key in doc.metadata}
+            content = doc.page_content + json.dumps(stable, sort_keys=True, default=str)
+            chunk_hash = hashlib.sha256(content.encode()).hexdigest()
+            occurrence = seen.get(chunk_hash, 0)
+            seen[chunk_hash] = occurrence + 1
+            embedding_id = str(uuid.uuid5(
+                uuid.NAMESPACE_URL, f"{self.collection_name}:{source}:{chunk_hash}:{occurrence}"
+            ))
+            ids.append((embedding_id, chunk_hash))
+        return ids
+
+    @staticmethod
+    def build_filters(
+        source: Optional[str] = None,
+        doc_type: Optional[str] = None,
+        effective_after: Optional[str] = None,
+        effective_before: Optional[str] = None,
+    ) -> Dict[str, str]:
+        """Collect the non-empty metadata filters of a search"""
+        filters = {
+            "file_name": os.path.basename(source) if source else None,
+            "doc_type": doc_type.lower().lstrip(".") if doc_type else None,
+            "effective_after": effective_after,
+            "effective_before": effective_before,
+        }
+        return {key: value for key, value in filters.items() if value}
+
+    def _format_results(self, results: List[Tuple[Document, float]]) -> str:
+        """Format search results with relevance scores for the agent"""
+        if not results:
+            return "No relevant policies found."
+        
+        formatted_results: list[str] = []
+        for i, (doc, score) in enumerate(results, 1):
+            # A chunk collapsed from several files lists each of them
+            sources = doc.metadata.get('sources') or [doc.metadata.get('source', 'Unknown')] # type: ignore
+            # Calibrated cosine similarity, not a raw distance
+            relevance = f"{score * 100:.1f}%"
+
+            source_lines = "".join(f"Source: {source}\n" for source in sources)
+            formatted_results.append(
+                f"Result {i} (Relevance: {relevance}):\n"
+                f"{source_lines}"
+                f"Content:\n{doc.page_content}\n"
+                f"{'-' * 80}"
+            )
+        
+        return "\n".join(formatted_results)
+
+    def search_policies(
+        self,
+        query: str,
+        k: int = 8,
+        source: Optional[str] = None,
+        doc_type: Optional[str] = None,
+        effective_after: Optional[str] = None,
+        effective_before: Optional[str] = None,
+    ) -> str:
+        """
+        This searchs Anything Related HR policies and documents for Presidio Employees.
+        
+        Args:
+            query: Search query
+            k: Maximum number of results; fewer are returned when the rest are
+                not relevant enough or would exceed the context budget
+            source: Only search this policy file, e.g. "HR_Policy_Handbook.txt"
+            doc_type: Only search this document type: "pdf", "txt" or "docx"
+            effective_after: Only policies effective on/after this date (YYYY-MM-DD)
+            effective_before: Only policies effective on/before this date (YYYY-MM-DD)
+            
+        Returns:
+            Formatted search results
+        """
+        filters = self.build_filters(source, doc_type, effective_after, effective_before)
+        # Perform similarity search with scores
+        results = self.select_results(self.retrieve(query, k=k, filters=filters))
+        return self._format_results(results)
+
+    async def asearch_policies(
+        self,
+        query: str,
+        k: int = 8,
+        source: Optional[str] = None,
+        doc_type: Optional[str] = None,
+        effective_after: Optional[str] = None,
+        effective_before: Optional[str] = None,
+    ) -> str:
+        """
+        This searchs Anything Related HR policies and documents for Presidio Employees.
+        
+        Args:
+            query: Search query
+            k: Maximum number of results; fewer are returned when the rest are
+                not relevant enough or would exceed the context budget
+            source: Only search this policy file, e.g. "HR_Policy_Handbook.txt"
+            doc_type: Only search this document type: "pdf", "txt" or "docx"
+            effective_after: Only policies effective on/after this date (YYYY-MM-DD)
+            effective_before: Only policies effective on/before this date (YYYY-MM-DD)
+            
+        Returns:
+            Formatted search results
+        """
+        filters = self.build_filters(source, doc_type, effective_after, effective_before)
+        # Native async so concurrent agent sessions don't block the event loop
+        results = self.select_results(await self.aretrieve(query, k=k, filters=filters))
+        return self._format_results(results)
+
+    def as_tool(self) -> StructuredTool:
+        """search_policies as a tool with both sync and native async (coroutine) paths"""
+        return StructuredTool.from_function(
+            func=self.search_policies,
+            coroutine=self.asearch_policies,
+            name="search_policies",
+        )
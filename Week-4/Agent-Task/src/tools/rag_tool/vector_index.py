@@ -0,0 +1,295 @@
+"""
+ANN index management (HNSW / IVFFlat) for a pgvector collection
+"""
+import re
+import statistics
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from src.tools.rag_tool.pg_pool import PgConnectionManager
+from src.tools.rag_tool.rag_base import latency_summary
+
+# distance strategy -> (pgvector operator, operator class)
+DISTANCE_OPS = {
+    "cosine": ("<=>", "vector_cosine_ops"),
+    "l2": ("<->", "vector_l2_ops"),
+    "inner_product": ("<#>", "vector_ip_ops"),
+}
+
+INDEX_METHODS = ("hnsw", "ivfflat")
+
+# Quantized storage for the ANN stage; full vectors stay in the table for re-ranking
+QUANTIZATIONS = ("halfvec", "binary")
+
+# distance strategy -> halfvec operator class
+HALFVEC_OPS = {
+    "cosine": "halfvec_cosine_ops",
+    "l2": "halfvec_l2_ops",
+    "inner_product": "halfvec_ip_ops",
+}
+
+
+def quantized_expressions(quantization: str, dimension: int, operator: str) -> Tuple[str, str, str]:
+    """
+    (column expression, query expression, operator) for a quantized ANN scan.
+    The column expression must match the index expression exactly.
+    """
+    if quantization == "halfvec":
+        return (
+            f"embedding::halfvec({dimension})",
+            f"%(vector)s::halfvec({dimension})",
+            operator,
+        )
+    if quantization == "binary":
+        return (
+            f"binary_quantize(embedding)::bit({dimension})",
+            "binary_quantize(%(vector)s::vector)",
+            "<~>",
+        )
+    raise ValueError(f"Unsupported quantization: {quantization}")
+
+
+class VectorIndexManager:
+    """
+    Creates, rebuilds and drops the ANN index of one collection.
+
+    langchain_pg_embedding holds every collection, so indexes are partial
+    (WHERE collection_id = ...) and named after the collection. pgvector can
+    only index a column with a fixed dimension, so the embedding column is
+    typed to the model's dimension before the first index is built.
+    """
+
+    def __init__(
+        self,
+        db: PgConnectionManager,
+        collection_name: str,
+        distance_strategy: str = "cosine",
+        dimension_fn: Optional[Callable[[], int]] = None,
+    ):
+        """
+        Initialize the index manager
+
+        Args:
+            db: Shared connection manager
+            collection_name: Collection the index covers
+            distance_strategy: "cosine", "l2" or "inner_product"; must match the
+                metric used for searches
+            dimension_fn: Returns the embedding dimension (called lazily)
+        """
+        if distance_strategy not in DISTANCE_OPS:
+            raise ValueError(f"Unsupported distance strategy: {distance_strategy}")
+        self.db = db
+        self.collection_name = collection_name
+        self.distance_strategy = distance_strategy
+        self.operator, self.opclass = DISTANCE_OPS[distance_strategy]
+        self.dimension_fn = dimension_fn
+
+    @property
+    def index_prefix(self) -> str:
+        safe_name = re.sub(r"[^a-z0-9_]", "_", self.collection_name.lower())
+        return f"ix_emb_{safe_name}"
+
+    def index_name(self, method: str, quantization: Optional[str] = None) -> str:
+        suffix = f"_{quantization}" if quantization else ""
+        # Postgres truncates identifiers to 63 bytes; use the name it stores
+        return f"{self.index_prefix}_{method}{suffix}"[:63]
+
+    def index_names(self) -> List[str]:
+        """Every index name this collection can own (one per method and quantization)"""
+        return [
+            self.index_name(method, quantization)
+            for method in INDEX_METHODS
+            for quantization in (None, *QUANTIZATIONS)
+        ]
+
+    def _collection_id(self, cursor) -> str:
+        cursor.execute("SELECT uuid FROM langchain_pg_collection WHERE name = %s", (self.collection_name,))
+        row = cursor.fetchone()
+        if row is None:
+            raise ValueError(f"Collection not found: {self.collection_name}")
+        return str(row[0])
+
+    def column_dimension(self) -> Optional[int]:
+        """Typed dimension of the embedding column, None while it is untyped (read-only)"""
+        with self.db.cursor() as cursor:
+            cursor.execute("""
+                SELECT atttypmod FROM pg_attribute
+                WHERE attrelid = 'langchain_pg_embedding'::regclass AND attname = 'embedding'
+            """)
+            typmod = cursor.fetchone()[0]
+        return typmod if typmod > 0 else None
+
+    def ensure_dimension(self) -> int:
+        """Type the embedding column as vector(dim) so it can be indexed; returns dim"""
+        typmod = self.column_dimension()
+        if typmod is not None:
+            return typmod
+        if self.dimension_fn is None:
+            raise ValueError("Embedding column has no dimension and no dimension_fn was given")
+        dimension = int(self.dimension_fn())
+        with self.db.cursor() as cursor:
+            # Fails if another collection stores vectors of a different size
+            cursor.execute(
+                f"ALTER TABLE langchain_pg_embedding ALTER COLUMN embedding TYPE vector({dimension})"
+            )
+            print(f"✓ Embedding column typed as vector({dimension})")
+            return dimension
+
+    def create(
+        self,
+        method: str = "hnsw",
+        m: int = 16,
+        ef_construction: int = 64,
+        lists: Optional[int] = None,
+        quantization: Optional[str] = None,
+    ) -> str:
+        """
+        Create (or replace) the ANN index for the collection
+
+        Args:
+            method: "hnsw" or "ivfflat"
+            m: HNSW max connections per layer
+            ef_construction: HNSW candidate list size while building
+            lists: IVFFlat list count, defaults to rows / 1000 (min 1)
+            quantization: None for full float32 vectors, "halfvec" (float16) or
+                "binary" (1 bit per dimension, Hamming distance) to index a
+                compact copy; searches then re-rank candidates at full precision
+
+        Returns:
+            Name of the created index
+        """
+        if method not in INDEX_METHODS:
+            raise ValueError(f"Unsupported index method: {method}")
+        if quantization is not None and quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unsupported quantization: {quantization}")
+        dimension = self.ensure_dimension()
+        self.drop()
+
+        if quantization == "halfvec":
+            key = f"(embedding::halfvec({dimension})) {HALFVEC_OPS[self.distance_strategy]}"
+        elif quantization == "binary":
+            key = f"(binary_quantize(embedding)::bit({dimension})) bit_hamming_ops"
+        else:
+            key = f"embedding {self.opclass}"
+
+        with self.db.cursor() as cursor:
+            collection_id = self._collection_id(cursor)
+            if method == "hnsw":
+                options = f"m = {int(m)}, ef_construction = {int(ef_construction)}"
+            else:
+                if lists is None:
+                    cursor.execute(
+                        "SELECT COUNT(*) FROM langchain_pg_embedding WHERE collection_id = %s",
+                        (collection_id,)
+                    )
+                    lists = max(1, cursor.fetchone()[0] // 1000)
+                options = f"lists = {int(lists)}"
+
+            name = self.index_name(method, quantization)
+            start = time.perf_counter()
+            cursor.execute(
+                f"""
+                CREATE INDEX {name} ON langchain_pg_embedding
+                USING {method} ({key})
+                WITH ({options})
+                WHERE collection_id = %s
+                """,
+                (collection_id,)
+            )
+        print(f"✓ Created {method} index {name} ({options}) in {time.perf_counter() - start:.2f}s")
+        return name
+
+    def drop(self):
+        """Drop every ANN index of this collection"""
+        indexes = self.list_indexes()
+        with self.db.cursor() as cursor:
+            for index in indexes:
+                cursor.execute(f"DROP INDEX IF EXISTS {index['name']}")
+
+    def rebuild(self):
+        """Rebuild existing indexes in place (e.g. after large deletes or a bulk load)"""
+        with self.db.cursor() as cursor:
+            for index in self.list_indexes():
+                cursor.execute(f"REINDEX INDEX {index['name']}")
+                print(f"✓ Rebuilt {index['name']}")
+
+    def list_indexes(self) -> List[Dict[str, Any]]:
+        """Existing ANN indexes of this collection with their definitions and on-disk size"""
+        # Exact names: a prefix match would also pick up e.g. "policies_v2" for "policies"
+        with self.db.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT indexname, indexdef,
+                       pg_relation_size(format('%%I', indexname)::regclass)
+                FROM pg_indexes
+                WHERE tablename = 'langchain_pg_embedding' AND indexname = ANY(%s)
+                """,
+                (self.index_names(),)
+            )
+            return [
+                {"name": name, "definition": definition, "size_bytes": size}
+                for name, definition, size in cursor.fetchall()
+            ]
+
+    def active_quantization(self) -> Optional[str]:
+        """Quantization of the current index, None for a full-precision index"""
+        names = {index["name"] for index in self.list_indexes()}
+        for quantization in QUANTIZATIONS:
+            if any(self.index_name(method, quantization) in names for method in INDEX_METHODS):
+                return quantization
+        return None
+
+    @staticmethod
+    def settings_statements(
+        ef_search: Optional[int] = None, probes: Optional[int] = None, exact: bool = False
+    ) -> List[str]:
+        """Per-query index settings; must run in the same transaction as the search"""
+        statements = []
+        if ef_search is not None:
+            statements.append(f"SET LOCAL hnsw.ef_search = {int(ef_search)}")
+        if probes is not None:
+            statements.append(f"SET LOCAL ivfflat.probes = {int(probes)}")
+        if exact:
+            # Force a sequential scan for exact (ground-truth) results
+            statements.append("SET LOCAL enable_indexscan = off")
+            statements.append("SET LOCAL enable_bitmapscan = off")
+        return statements
+
+    @staticmethod
+    def benchmark(
+        search_fn: Callable[..., List[str]],
+        query_vectors: Sequence[List[float]],
+        k: int = 10,
+        settings: Optional[List[Dict[str, int]]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Measure recall@k against exact search and latency per index setting
+
+        Args:
+            search_fn: (vector, k, ef_search=..., probes=..., exact=...) -> result ids
+            query_vectors: Query embeddings to run
+            k: Results per query
+            settings: Search settings to compare, e.g. [{"ef_search": 40}, {"probes": 10}]
+
+        Returns:
+            One row per setting with recall, mean/p50/p95 latency in ms
+        """
+        if len(query_vectors) == 0:
+            raise ValueError("Benchmark needs at least one query")
+        settings = settings or [{"ef_search": ef} for ef in (10, 20, 40, 80, 160)]
+        truth = [set(search_fn(vector, k, exact=True)) for vector in query_vectors]
+
+        rows = []
+        for setting in settings:
+            latencies, recalls = [], []
+            for vector, expected in zip(query_vectors, truth):
+                start = time.perf_counter()
+                found = search_fn(vector, k, **setting)
+                latencies.append((time.perf_counter() - start) * 1000)
+                recalls.append(len(expected & set(found)) / len(expected) if expected else 1.0)
+            rows.append({
+                **setting,
+                "recall": round(statistics.mean(recalls), 4),
+                **latency_summary(latencies),
+            })
+            print(f"  {setting}: recall@{k}={rows[-1]['recall']} p50={rows[-1]['p50_ms']}ms")
+        return rows
@@ -0,0 +1,98 @@
+"""
+Cache pre-warming from historical query logs.
+
+main.py appends every user question to a JSONL query log. At startup (or as
+an offline job) the most frequent questions are replayed through the agent
+so the prompt cache and the tool caches are warm before real traffic arrives.
+"""
+import asyncio
+import json
+import os
+import time
+from collections import Counter
+from typing import Awaitable, Callable, Dict, List, Tuple
+from src.tools.rag_tool.embedding_cache import normalize_text
+
+
+def log_query(log_path: str, query: str):
+    """Append a user question to the query log"""
+    with open(log_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"ts": time.time(), "query": query}) + "\n")
+
+
+def load_top_queries(log_path: str, top_n: int = 20, min_count: int = 2) -> List[Tuple[str, int]]:
+    """
+    Rank logged questions by frequency
+
+    Args:
+        log_path: JSONL log ({"query": ...} per line); plain-text lines are accepted too
+        top_n: Number of questions to return
+        min_count: Ignore questions asked fewer times than this
+
+    Returns:
+        List of (query, count), most frequent first. Each query is the most
+        common original phrasing within its normalized group.
+    """
+    if not os.path.exists(log_path):
+        return []
+
+    counts: Counter = Counter()
+    phrasings: Dict[str, Counter] = {}
+    with open(log_path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                query = json.loads(line)["query"]
+            except (json.JSONDecodeError, KeyError, TypeError):
+                query = line
+            key = normalize_text(query)
+            if not key:
+                continue
+            counts[key] += 1
+            phrasings.setdefault(key, Counter())[query.strip()] += 1
+
+    return [
+        (phrasings[key].most_common(1)[0][0], count)
+        for key, count in counts.most_common(top_n)
+        if count >= min_count
+    ]
+
+
+async def warm_cache(
+    answer_fn: Callable[[str, str], Awaitable[Tuple[str, bool]]],
+    queries: List[Tuple[str, int]],
+    concurrency: int = 2,
+) -> Dict[str, int]:
+    """
+    Run the given queries through the agent to fill the caches
+
+    Args:
+        answer_fn: Coroutine (query, thread_id) -> (response, from_cache)
+        queries: Output of load_top_queries
+        concurrency: Agent runs allowed at the same time
+
+    Returns:
+        Counts of warmed, already cached and failed queries
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    stats = {"warmed": 0, "already_cached": 0, "failed": 0}
+
+    async def warm_one(i: int, query: str):
+        async with semaphore:
+            try:
+                # Separate thread per query so warm-up does not leak into user memory
+                _, from_cache = await answer_fn(query, f"warmup-{i}")
+                stats["already_cached" if from_cache else "warmed"] += 1
+            except Exception as e:
+                stats["failed"] += 1
+                print(f"  Warm-up failed for '{query}': {e}")
+
+    start = time.time()
+    await asyncio.gather(*(warm_one(i, query) for i, (query, _) in enumerate(queries)))
+    print(
+        f"✓ Cache warm-up: {stats['warmed']} warmed, {stats['already_cached']} already cached, "
+        f"{stats['failed']} failed in {time.time() - start:.1f}s"
+    )
+    return stats
@@ -1,13 +1,140 @@
+import asyncio
 import hashlib
 import json
-from typing import List, Dict, Any
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import List, Dict, Any, Iterable, Optional, Set, Tuple
+
+import numpy as np
+
 
 class PromptCache:
-    """Simple hash-based prompt cache using hashmap."""
-    
-    def __init__(self):
-        self.cache: Dict[str, Any] = {}
-    
+    """
+    Hash-based prompt cache with LRU eviction, per-entry TTL and a byte bound.
+
+    Entries live in an in-memory OrderedDict (most recently used at the end).
+    When `db_path` is given, entries are also written through to a SQLite file
+    so that a restarted process (or another agent process on the same host)
+    starts warm instead of cold.
+
+    When an `embeddings` model is given the cache also runs in semantic mode:
+    an exact-hash miss falls back to a nearest-neighbour search over the
+    embeddings of cached prompts, so paraphrased questions can still hit.
+    Prompt embeddings are stored next to the entries in SQLite, so the
+    semantic index is rebuilt on startup and picks up entries written by
+    sibling processes.
+
+    Entries can carry tags naming the tools and source documents that
+    produced them (e.g. "file:/.../HR_Policy_Handbook.txt", "drive:<id>"),
+    so `invalidate_tag` can drop only the answers affected by an edit.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 50 * 1024 * 1024,
+        default_ttl: Optional[float] = 24 * 60 * 60,
+        db_path: Optional[str] = None,
+        max_disk_bytes: int = 500 * 1024 * 1024,
+        embeddings: Any = None,
+        similarity_threshold: float = 0.92,
+        near_miss_threshold: float = 0.85,
+    ):
+        """
+        Initialize the prompt cache
+
+        Args:
+            max_bytes: Memory bound for cached responses (serialized size in bytes)
+            default_ttl: Seconds an entry stays valid, None for no expiry
+            db_path: Optional SQLite file shared between agent processes
+            max_disk_bytes: Size bound for the SQLite store
+            embeddings: Optional LangChain embeddings model (e.g. the OllamaEmbeddings
+                used by PgVectorRAGTool) that enables semantic lookup
+            similarity_threshold: Cosine similarity needed for a semantic hit
+            near_miss_threshold: Similarities between this and the hit threshold
+                are counted as near misses (useful for tuning the threshold)
+        """
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.max_disk_bytes = max_disk_bytes
+        self.db_path = db_path
+
+        # key -> (response, expires_at, size_in_bytes, store_version); the version
+        # is a token written with every store write, so a memory hit can tell
+        # that another process replaced the entry
+        self.cache: "OrderedDict[str, Tuple[Any, Optional[float], int, Optional[str]]]" = OrderedDict()
+        self.current_bytes = 0
+        self._lock = threading.RLock()
+
+        # tag -> keys and key -> tags for selective invalidation
+        self._tag_index: Dict[str, Set[str]] = {}
+        self._key_tags: Dict[str, Set[str]] = {}
+
+        # Semantic index over the entries held in memory: row i of the matrix
+        # (the first len(self._index_keys) rows are in use) is the
+        # unit-normalized embedding of the prompt cached under self._index_keys[i]
+        self.embeddings = embeddings
+        self.similarity_threshold = similarity_threshold
+        self.near_miss_threshold = near_miss_threshold
+        self._index_keys: List[str] = []
+        self._index_contexts: List[str] = []
+        self._index_rows: Dict[str, int] = {}
+        self._index_matrix: Optional[np.ndarray] = None
+        self._last_embedding: Optional[Tuple[str, np.ndarray]] = None
+
+        self._db: Optional[sqlite3.Connection] = None
+        # Highest store rowid already loaded; INSERT OR REPLACE assigns a new one
+        self._store_rowid = 0
+        if db_path:
+            self._initialize_store()
+            if embeddings is not None:
+                self._load_from_store(warm_start=True)
+
+        self.hits = 0
+        self.semantic_hits = 0
+        self.near_misses = 0
+        self.misses = 0
+
+    def _initialize_store(self):
+        """Open the shared SQLite store and create the cache table"""
+        self._db = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        # WAL lets several agent processes read while one writes
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS prompt_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(prompt_cache)")}
+        # Stores created before semantic mode lack the embedding columns
+        if "embedding" not in columns:
+            self._db.execute("ALTER TABLE prompt_cache ADD COLUMN embedding BLOB")
+        if "context_hash" not in columns:
+            self._db.execute("ALTER TABLE prompt_cache ADD COLUMN context_hash TEXT")
+        if "version" not in columns:
+            self._db.execute("ALTER TABLE prompt_cache ADD COLUMN version TEXT")
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_prompt_cache_access ON prompt_cache (last_access)"
+        )
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS prompt_cache_tags (
+                key TEXT NOT NULL,
+                tag TEXT NOT NULL,
+                PRIMARY KEY (key, tag)
+            )
+        """)
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_prompt_cache_tags_tag ON prompt_cache_tags (tag)"
+        )
+        self._db.commit()
+
     def _create_hash(self, prompt: str, context: List = None) -> str:
         """Create hash from prompt and optional context."""
         content = prompt
@@ -15,24 +142,490 @@ class PromptCache:
             # Include recent context in hash
             content += json.dumps([msg.content for msg in context[-4:]], sort_keys=True)
         return hashlib.sha256(content.encode()).hexdigest()
-    
+
+    def key_for(self, prompt: str, context: List = None) -> str:
+        """Public cache key for a prompt, e.g. for coalescing in-flight requests"""
+        return self._create_hash(prompt, context)
+
+    @staticmethod
+    def _context_hash(context: List = None) -> str:
+        """Hash of the recent context only, so semantic matches stay within the same conversation state"""
+        if not context:
+            return ""
+        content = json.dumps([msg.content for msg in context[-4:]], sort_keys=True)
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def _embed(self, prompt: str) -> np.ndarray:
+        """Embed and unit-normalize a prompt, reusing the last embedding for get-then-set"""
+        last = self._last_embedding
+        if last is not None and last[0] == prompt:
+            return last[1]
+        return self._remember_embedding(prompt, self.embeddings.embed_query(prompt))
+
+    async def _aembed(self, prompt: str) -> np.ndarray:
+        """Async variant of `_embed` that awaits the model instead of blocking the event loop"""
+        last = self._last_embedding
+        if last is not None and last[0] == prompt:
+            return last[1]
+        return self._remember_embedding(prompt, await self.embeddings.aembed_query(prompt))
+
+    def _remember_embedding(self, prompt: str, embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector = vector / norm
+        self._last_embedding = (prompt, vector)
+        return vector
+
+    def _index_add(self, cache_key: str, context_hash: str, vector: np.ndarray):
+        """Add or replace a prompt embedding in the semantic index"""
+        if self._index_matrix is not None and vector.shape[0] != self._index_matrix.shape[1]:
+            # Stored by a different embedding model
+            return
+        row = self._index_rows.get(cache_key)
+        if row is None:
+            row = len(self._index_keys)
+            if self._index_matrix is None:
+                self._index_matrix = np.empty((64, vector.shape[0]), dtype=np.float32)
+            elif row == len(self._index_matrix):
+                # Grow geometrically instead of copying the matrix on every insert
+                grown = np.empty((2 * row, self._index_matrix.shape[1]), dtype=np.float32)
+                grown[:row] = self._index_matrix
+                self._index_matrix = grown
+            self._index_rows[cache_key] = row
+            self._index_keys.append(cache_key)
+            self._index_contexts.append(context_hash)
+        else:
+            self._index_contexts[row] = context_hash
+        self._index_matrix[row] = vector
+
+    def _index_remove(self, cache_key: str):
+        row = self._index_rows.pop(cache_key, None)
+        if row is None:
+            return
+        # Move the last row into the gap so the used rows stay contiguous
+        last = len(self._index_keys) - 1
+        if row != last:
+            moved_key = self._index_keys[last]
+            self._index_matrix[row] = self._index_matrix[last]
+            self._index_keys[row] = moved_key
+            self._index_contexts[row] = self._index_contexts[last]
+            self._index_rows[moved_key] = row
+        self._index_keys.pop()
+        self._index_contexts.pop()
+
+    def _load_from_store(self, warm_start: bool = False):
+        """
+        Load entries that carry a prompt embedding from the shared store into
+        memory and the semantic index: on startup the most recently used ones
+        up to the memory bound, afterwards the rows other processes wrote
+        since the last load.
+        """
+        now = time.time()
+        if warm_start:
+            rows = self._db.execute(
+                """
+                SELECT rowid, key, value, expires_at, size, embedding, context_hash, version
+                FROM prompt_cache
+                WHERE embedding IS NOT NULL AND (expires_at IS NULL OR expires_at > ?)
+                ORDER BY last_access DESC
+                """,
+                (now,)
+            )
+            selected, total = [], 0
+            for row in rows:
+                total += row[4]
+                if total > self.max_bytes:
+                    break
+                selected.append(row)
+            # Insert least recently used first so the LRU order matches the store
+            selected.reverse()
+            self._store_rowid = self._db.execute(
+                "SELECT COALESCE(MAX(rowid), 0) FROM prompt_cache"
+            ).fetchone()[0]
+        else:
+            selected = self._db.execute(
+                """
+                SELECT rowid, key, value, expires_at, size, embedding, context_hash, version
+                FROM prompt_cache
+                WHERE rowid > ? AND embedding IS NOT NULL AND (expires_at IS NULL OR expires_at > ?)
+                ORDER BY rowid
+                """,
+                (self._store_rowid, now)
+            ).fetchall()
+
+        for rowid, key, value, expires_at, size, embedding, context_hash, version in selected:
+            self._store_rowid = max(self._store_rowid, rowid)
+            entry = self.cache.get(key)
+            if entry is not None and entry[3] == (version or "") and key in self._index_rows:
+                continue
+            self._store_in_memory(
+                key, json.loads(value), expires_at, size,
+                np.frombuffer(embedding, dtype=np.float32), context_hash or "", version
+            )
+
+    def _semantic_lookup(self, vector: np.ndarray, context_hash: str) -> Any:
+        """
+        Return the response of the most similar cached prompt above the threshold
+
+        The prompt embedding is computed by the caller before taking the lock,
+        so a slow embedding model never blocks other cache users.
+        """
+        with self._lock:
+            return self._nearest(vector, context_hash)
+
+    def _nearest(self, vector: np.ndarray, context_hash: str) -> Any:
+        if self._db is not None:
+            self._load_from_store()
+        if not self._index_keys:
+            return None
+
+        similarities = self._index_matrix[:len(self._index_keys)] @ vector
+        # Only compare against prompts cached under the same context
+        mask = np.array([c == context_hash for c in self._index_contexts])
+        similarities = np.where(mask, similarities, -1.0)
+        best = int(np.argmax(similarities))
+        score = float(similarities[best])
+
+        if score < self.similarity_threshold:
+            if score >= self.near_miss_threshold:
+                self.near_misses += 1
+            return None
+
+        cache_key = self._index_keys[best]
+        return self.get_by_key(cache_key)
+
+    @staticmethod
+    def _serialize(response: Any) -> str:
+        """Serialize a response for size accounting and the disk store"""
+        return json.dumps(response, default=str)
+
+    @staticmethod
+    def _is_expired(expires_at: Optional[float], now: float) -> bool:
+        return expires_at is not None and expires_at <= now
+
+    def _remove(self, cache_key: str):
+        """Drop an entry (and its prompt embedding) from memory and keep the byte counter in sync"""
+        entry = self.cache.pop(cache_key, None)
+        if entry is not None:
+            self.current_bytes -= entry[2]
+        self._index_remove(cache_key)
+        for tag in self._key_tags.pop(cache_key, ()):
+            keys = self._tag_index.get(tag)
+            if keys is not None:
+                keys.discard(cache_key)
+                if not keys:
+                    del self._tag_index[tag]
+
+    def _store_in_memory(
+        self,
+        cache_key: str,
+        response: Any,
+        expires_at: Optional[float],
+        size: int,
+        vector: Optional[np.ndarray] = None,
+        context_hash: str = "",
+        version: Optional[str] = None,
+    ):
+        """Insert as most recently used, then evict LRU entries over the byte bound"""
+        self._remove(cache_key)
+        if size > self.max_bytes:
+            return
+        self.cache[cache_key] = (response, expires_at, size, version or "")
+        self.current_bytes += size
+        if vector is not None:
+            self._index_add(cache_key, context_hash, vector)
+
+        while self.current_bytes > self.max_bytes and self.cache:
+            oldest_key = next(iter(self.cache))
+            self._remove(oldest_key)
+
     def get(self, prompt: str, context: List = None) -> Any:
         """Get cached response if exists."""
         cache_key = self._create_hash(prompt, context)
-        return self.cache.get(cache_key)
-    
-    def set(self, prompt: str, response: Any, context: List = None):
+        response = self.get_by_key(cache_key)
+        if response is not None:
+            self.hits += 1
+            return response
+
+        if self.embeddings is not None:
+            response = self._semantic_lookup(self._embed(prompt), self._context_hash(context))
+            if response is not None:
+                self.semantic_hits += 1
+                return response
+
+        self.misses += 1
+        return None
+
+    async def aget(self, prompt: str, context: List = None) -> Any:
+        """
+        Async variant of `get` for the agent's event loop: the embedding is
+        awaited and the SQLite work runs in a worker thread
+        """
+        response, semantic = await self._alookup(prompt, context)
+        if response is None:
+            self.misses += 1
+        elif semantic:
+            self.semantic_hits += 1
+        else:
+            self.hits += 1
+        return response
+
+    async def apeek(self, prompt: str, context: List = None) -> Any:
+        """Like `aget` but without touching the hit/miss counters, for rechecks of a counted lookup"""
+        response, _ = await self._alookup(prompt, context)
+        return response
+
+    async def _alookup(self, prompt: str, context: List = None) -> Tuple[Any, bool]:
+        """Exact then semantic lookup; returns (response, whether it was a semantic hit)"""
+        cache_key = self._create_hash(prompt, context)
+        response = await asyncio.to_thread(self.get_by_key, cache_key)
+        if response is not None or self.embeddings is None:
+            return response, False
+
+        vector = await self._aembed(prompt)
+        response = await asyncio.to_thread(self._semantic_lookup, vector, self._context_hash(context))
+        return response, response is not None
+
+    def get_by_key(self, cache_key: str) -> Any:
+        """Get cached response for an already computed cache key"""
+        now = time.time()
+        with self._lock:
+            entry = self.cache.get(cache_key)
+            if entry is not None:
+                response, expires_at, _, version = entry
+                if self._is_expired(expires_at, now):
+                    self._remove(cache_key)
+                    self._delete_from_store(cache_key)
+                    return None
+                if self._db is None:
+                    self.cache.move_to_end(cache_key)
+                    return response
+                stored = self._store_version(cache_key)
+                if stored is None:
+                    # Invalidated by another process
+                    self._remove(cache_key)
+                    return None
+                if stored == version:
+                    self.cache.move_to_end(cache_key)
+                    return response
+                # Replaced by another process: reload below
+                self._remove(cache_key)
+
+            # Fall back to the shared disk store
+            if self._db is None:
+                return None
+            row = self._db.execute(
+                "SELECT value, expires_at, size, embedding, context_hash, version FROM prompt_cache WHERE key = ?",
+                (cache_key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            value, expires_at, size, embedding, context_hash, version = row
+            if self._is_expired(expires_at, now):
+                self._delete_from_store(cache_key)
+                return None
+
+            self._db.execute(
+                "UPDATE prompt_cache SET last_access = ? WHERE key = ?", (now, cache_key)
+            )
+            self._db.commit()
+            response = json.loads(value)
+            vector = np.frombuffer(embedding, dtype=np.float32) if embedding is not None else None
+            self._store_in_memory(cache_key, response, expires_at, size, vector, context_hash or "", version)
+            return response
+
+    def set(
+        self,
+        prompt: str,
+        response: Any,
+        context: List = None,
+        ttl: Optional[float] = None,
+        tags: Optional[Iterable[str]] = None,
+    ):
         """Store response in cache."""
         cache_key = self._create_hash(prompt, context)
-        self.cache[cache_key] = response
-        
-        # Keep cache size manageable (max 100 entries)
-        if len(self.cache) > 100:
-            # Remove oldest entry
-            oldest_key = next(iter(self.cache))
-            del self.cache[oldest_key]
-    
+        if self.embeddings is None:
+            self.set_by_key(cache_key, response, ttl, tags)
+        else:
+            self._write(cache_key, response, ttl, tags, self._embed(prompt), self._context_hash(context))
+
+    async def aset(
+        self,
+        prompt: str,
+        response: Any,
+        context: List = None,
+        ttl: Optional[float] = None,
+        tags: Optional[Iterable[str]] = None,
+    ):
+        """Async variant of `set`, see `aget`"""
+        cache_key = self._create_hash(prompt, context)
+        vector = await self._aembed(prompt) if self.embeddings is not None else None
+        await asyncio.to_thread(
+            self._write, cache_key, response, ttl, tags, vector, self._context_hash(context)
+        )
+
+    def set_by_key(
+        self,
+        cache_key: str,
+        response: Any,
+        ttl: Optional[float] = None,
+        tags: Optional[Iterable[str]] = None,
+    ):
+        """Store response under an already computed cache key, tagged with its sources"""
+        self._write(cache_key, response, ttl, tags)
+
+    def _write(
+        self,
+        cache_key: str,
+        response: Any,
+        ttl: Optional[float],
+        tags: Optional[Iterable[str]],
+        vector: Optional[np.ndarray] = None,
+        context_hash: str = "",
+    ):
+        """Store an entry in memory and the shared store, with its prompt embedding if any"""
+        ttl = self.default_ttl if ttl is None else ttl
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else None
+        value = self._serialize(response)
+        size = len(value.encode())
+
+        tags = set(tags or ())
+        version = uuid.uuid4().hex
+
+        with self._lock:
+            self._store_in_memory(cache_key, response, expires_at, size, vector, context_hash, version)
+            if cache_key in self.cache and tags:
+                self._key_tags[cache_key] = tags
+                for tag in tags:
+                    self._tag_index.setdefault(tag, set()).add(cache_key)
+
+            if self._db is not None:
+                self._db.execute(
+                    """
+                    INSERT OR REPLACE INTO prompt_cache
+                        (key, value, expires_at, size, last_access, embedding, context_hash, version)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (
+                        cache_key, value, expires_at, size, now,
+                        vector.astype(np.float32).tobytes() if vector is not None else None,
+                        context_hash, version,
+                    )
+                )
+                self._db.execute("DELETE FROM prompt_cache_tags WHERE key = ?", (cache_key,))
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO prompt_cache_tags (key, tag) VALUES (?, ?)",
+                    [(cache_key, tag) for tag in tags]
+                )
+                self._db.commit()
+                self._trim_store(now)
+
+    def delete(self, cache_key: str):
+        """Remove a single entry from memory and disk"""
+        with self._lock:
+            self._remove(cache_key)
+            self._delete_from_store(cache_key)
+
+    def invalidate_tag(self, tag: str) -> int:
+        """Remove every entry tagged with `tag` and return how many were dropped"""
+        with self._lock:
+            keys = set(self._tag_index.get(tag, ()))
+            if self._db is not None:
+                keys.update(
+                    row[0] for row in self._db.execute(
+                        "SELECT key FROM prompt_cache_tags WHERE tag = ?", (tag,)
+                    )
+                )
+            for cache_key in keys:
+                self.delete(cache_key)
+            return len(keys)
+
+    def _store_version(self, cache_key: str) -> Optional[str]:
+        """
+        Version token of the entry in the shared store, None when another
+        process invalidated it; rows written before versioning report ""
+        """
+        row = self._db.execute("SELECT version FROM prompt_cache WHERE key = ?", (cache_key,)).fetchone()
+        if row is None:
+            return None
+        return row[0] or ""
+
+    def _delete_from_store(self, cache_key: str):
+        if self._db is None:
+            return
+        self._db.execute("DELETE FROM prompt_cache WHERE key = ?", (cache_key,))
+        self._db.execute("DELETE FROM prompt_cache_tags WHERE key = ?", (cache_key,))
+        self._db.commit()
+
+    def _trim_store(self, now: float):
+        """Drop expired rows, then least recently used rows over the disk bound"""
+        self._db.execute(
+            "DELETE FROM prompt_cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,)
+        )
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM prompt_cache").fetchone()[0]
+        if total > self.max_disk_bytes:
+            excess = total - self.max_disk_bytes
+            freed = 0
+            stale_keys = []
+            for key, size in self._db.execute(
+                "SELECT key, size FROM prompt_cache ORDER BY last_access ASC"
+            ):
+                stale_keys.append((key,))
+                freed += size
+                if freed >= excess:
+                    break
+            self._db.executemany("DELETE FROM prompt_cache WHERE key = ?", stale_keys)
+        self._db.execute(
+            "DELETE FROM prompt_cache_tags WHERE key NOT IN (SELECT key FROM prompt_cache)"
+        )
+        self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return entry counts, byte usage and hit/miss counters"""
+        with self._lock:
+            lookups = self.hits + self.semantic_hits + self.misses
+            stats = {
+                "entries": len(self.cache),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "near_misses": self.near_misses,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.semantic_hits) / lookups if lookups else 0.0,
+            }
+            if self.embeddings is not None:
+                stats["indexed_prompts"] = len(self._index_keys)
+            if self._db is not None:
+                count, total = self._db.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM prompt_cache"
+                ).fetchone()
+                stats["disk_entries"] = count
+                stats["disk_bytes"] = total
+            return stats
+
     def clear(self):
         """Clear the cache."""
-        self.cache.clear()
-        
\ No newline at end of file
+        with self._lock:
+            self.cache.clear()
+            self.current_bytes = 0
+            self._tag_index.clear()
+            self._key_tags.clear()
+            self._index_keys.clear()
+            self._index_contexts.clear()
+            self._index_rows.clear()
+            self._index_matrix = None
+            if self._db is not None:
+                self._db.execute("DELETE FROM prompt_cache")
+                self._db.execute("DELETE FROM prompt_cache_tags")
+                self._db.commit()
+
+    def close(self):
+        """Close the disk store"""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
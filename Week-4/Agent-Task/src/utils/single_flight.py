@@ -0,0 +1,48 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into one in-flight run.
+
+    The first caller for a key starts the work as a task; callers arriving
+    while it is still running await the same task and get the same result
+    (or exception) instead of starting their own agent run.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def run(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run `func` once per key among concurrent callers
+
+        Args:
+            key: Coalescing key, e.g. the prompt cache key
+            func: Zero-argument coroutine function doing the actual work
+
+        Returns:
+            The shared result of the in-flight run
+        """
+        task = self._in_flight.get(key)
+        if task is None:
+            self.started += 1
+            task = asyncio.ensure_future(func())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.coalesced += 1
+
+        # Shield so one cancelled caller does not cancel the run for everyone
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, int]:
+        """Return counts of started and coalesced runs"""
+        return {
+            "in_flight": len(self._in_flight),
+            "started": self.started,
+            "coalesced": self.coalesced,
+        }
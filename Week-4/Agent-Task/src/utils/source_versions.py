@@ -0,0 +1,248 @@
+"""
+Source version tracking for cache invalidation.
+
+Cached answers and tool results are tagged with the tools and documents that
+produced them. SourceVersionTracker watches those documents (content hash for
+local HR policy files, `modifiedTime` for Google Drive files) and invalidates
+only the cache entries whose sources changed.
+
+Checks do blocking file and Drive I/O; async callers use `arefresh` /
+`awatch`, which run them in a worker thread.
+"""
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from langchain.messages import HumanMessage, ToolMessage
+from src.tools.rag_tool.rag_base import hash_file
+from src.utils.prompt_cache import PromptCache
+
+SOURCE_PATTERN = re.compile(r"^Source: (.+)$", re.MULTILINE)
+DRIVE_ID_PATTERN = re.compile(r"^Document ID: (\S+)$", re.MULTILINE)
+
+
+def file_tag(path: str) -> str:
+    """Tag for a local source file, normalized so loader paths and scanned paths match"""
+    return f"file:{os.path.abspath(os.path.normpath(path))}"
+
+
+def drive_tag(file_id: str) -> str:
+    """Tag for a Google Drive document"""
+    return f"drive:{file_id}"
+
+
+def tool_tag(tool_name: str) -> str:
+    """Tag for the tool that produced an entry"""
+    return f"tool:{tool_name}"
+
+
+def content_text(content: Any) -> str:
+    """
+    Plain text of a tool result. MCP tools (langchain-mcp-adapters) return a
+    list of content blocks, e.g. [{"type": "text", "text": ...}]; their text
+    is joined so line-anchored patterns still match.
+    """
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        parts = []
+        for block in content:
+            if isinstance(block, str):
+                parts.append(block)
+            elif isinstance(block, dict) and block.get("type") == "text":
+                parts.append(block.get("text", ""))
+        return "\n".join(parts)
+    return json.dumps(content, default=str)
+
+
+def extract_tags_from_text(text: Any) -> Set[str]:
+    """Find source files and Drive documents referenced in a tool output"""
+    text = content_text(text)
+    tags = {file_tag(source.strip()) for source in SOURCE_PATTERN.findall(text)}
+    tags.update(drive_tag(file_id) for file_id in DRIVE_ID_PATTERN.findall(text))
+    return tags
+
+
+def extract_source_tags(messages: List[Any]) -> Set[str]:
+    """
+    Collect tool and source tags from the latest agent turn
+
+    Args:
+        messages: Agent result messages (the whole thread when a checkpointer is used)
+
+    Returns:
+        Tags for every tool called and document retrieved after the last user message
+    """
+    last_human = max(
+        (i for i, msg in enumerate(messages) if isinstance(msg, HumanMessage)),
+        default=-1
+    )
+    tags: Set[str] = set()
+    for msg in messages[last_human + 1:]:
+        if isinstance(msg, ToolMessage):
+            if msg.name:
+                tags.add(tool_tag(msg.name))
+            found = extract_tags_from_text(msg.content)
+            # A retrieved Drive document without a drive tag would never be
+            # invalidated; flag it instead of failing silently
+            text = content_text(msg.content)
+            if (msg.name == "search_and_retrieve" and text and not text.startswith("Error")
+                    and not any(tag.startswith("drive:") for tag in found)):
+                print("[Cache] search_and_retrieve result has no 'Document ID:' line; Drive edits will not invalidate it")
+            tags.update(found)
+    return tags
+
+
+class SourceVersionTracker:
+    """Detects changed source documents and invalidates dependent cache entries"""
+
+    def __init__(
+        self,
+        caches: Iterable[PromptCache],
+        docs_directory: str,
+        drive_lookup: Optional[Callable[[List[str]], Dict[str, str]]] = None,
+        state_path: Optional[str] = None,
+        min_interval: float = 30.0,
+    ):
+        """
+        Initialize the tracker
+
+        Args:
+            caches: Caches whose entries should be invalidated on change
+            docs_directory: Directory of local policy documents to hash
+            drive_lookup: Callable mapping Drive file ids to their modifiedTime
+            state_path: Optional JSON file so versions survive restarts
+                (needed when the caches are persisted to disk)
+            min_interval: Minimum seconds between two checks
+        """
+        self.caches = list(caches)
+        self.docs_directory = docs_directory
+        self.drive_lookup = drive_lookup
+        self.state_path = state_path
+        self.min_interval = min_interval
+        self._last_check = 0.0
+        # refresh and watch may run concurrently in worker threads
+        self._lock = threading.Lock()
+
+        self.file_versions: Dict[str, str] = {}
+        # tag -> (size, mtime_ns) at the last hash, so unchanged files are not re-read
+        self.file_stats: Dict[str, Tuple[int, int]] = {}
+        self.drive_versions: Dict[str, str] = {}
+        self._load_state()
+
+    def _load_state(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        with open(self.state_path) as f:
+            state = json.load(f)
+        self.file_versions = state.get("files", {})
+        self.file_stats = {tag: tuple(stat) for tag, stat in state.get("file_stats", {}).items()}
+        self.drive_versions = state.get("drive", {})
+
+    def _save_state(self):
+        if not self.state_path:
+            return
+        with open(self.state_path, "w") as f:
+            json.dump(
+                {"files": self.file_versions, "file_stats": self.file_stats, "drive": self.drive_versions},
+                f, indent=2
+            )
+
+    def watch(self, tags: Iterable[str]):
+        """Start tracking the Drive documents referenced by newly cached entries"""
+        with self._lock:
+            new_ids = [
+                tag[len("drive:"):] for tag in tags
+                if tag.startswith("drive:") and tag[len("drive:"):] not in self.drive_versions
+            ]
+            if not new_ids:
+                return
+            versions: Dict[str, str] = {}
+            if self.drive_lookup is not None:
+                try:
+                    versions = self.drive_lookup(new_ids)
+                except Exception as e:
+                    print(f"Drive version lookup failed: {e}")
+            for file_id in new_ids:
+                self.drive_versions[file_id] = versions.get(file_id, "")
+            self._save_state()
+
+    async def awatch(self, tags: Iterable[str]):
+        """watch() without blocking the event loop on the Drive lookup"""
+        await asyncio.to_thread(self.watch, list(tags))
+
+    def _invalidate(self, tag: str) -> int:
+        return sum(cache.invalidate_tag(tag) for cache in self.caches)
+
+    def _check_files(self) -> int:
+        current: Dict[str, str] = {}
+        stats: Dict[str, Tuple[int, int]] = {}
+        for path in Path(self.docs_directory).glob("**/*"):
+            if path.is_file():
+                tag = file_tag(str(path))
+                stat = path.stat()
+                stats[tag] = (stat.st_size, stat.st_mtime_ns)
+                if self.file_stats.get(tag) == stats[tag] and tag in self.file_versions:
+                    current[tag] = self.file_versions[tag]
+                else:
+                    current[tag] = hash_file(path)
+
+        invalidated = 0
+        # Edited or deleted files; new files only matter for future answers
+        for tag, version in self.file_versions.items():
+            if current.get(tag) != version:
+                invalidated += self._invalidate(tag)
+        self.file_versions = current
+        self.file_stats = stats
+        return invalidated
+
+    def _check_drive(self) -> int:
+        if self.drive_lookup is None or not self.drive_versions:
+            return 0
+
+        current = self.drive_lookup(list(self.drive_versions))
+        invalidated = 0
+        for file_id, version in self.drive_versions.items():
+            new_version = current.get(file_id, "")
+            # An empty stored version means the first lookup failed, just record it now
+            if version and new_version != version:
+                invalidated += self._invalidate(drive_tag(file_id))
+            self.drive_versions[file_id] = new_version
+        return invalidated
+
+    def refresh(self, force: bool = False) -> int:
+        """
+        Compare source versions with the last check and invalidate stale entries
+
+        Args:
+            force: Ignore `min_interval` and check now
+
+        Returns:
+            Number of cache entries invalidated
+        """
+        with self._lock:
+            now = time.time()
+            if not force and now - self._last_check < self.min_interval:
+                return 0
+            self._last_check = now
+
+            invalidated = self._check_files()
+            try:
+                invalidated += self._check_drive()
+            except Exception as e:
+                print(f"Drive version check failed: {e}")
+            self._save_state()
+
+        if invalidated:
+            print(f"[Cache] Invalidated {invalidated} entries from changed sources")
+        return invalidated
+
+    async def arefresh(self, force: bool = False) -> int:
+        """refresh() in a worker thread, so hashing and Drive calls do not block the event loop"""
+        if not force and time.time() - self._last_check < self.min_interval:
+            return 0
+        return await asyncio.to_thread(self.refresh, force)
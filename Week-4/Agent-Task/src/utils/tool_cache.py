@@ -0,0 +1,118 @@
+import hashlib
+import json
+from typing import Any, Callable, Awaitable, Dict, Optional
+from langchain.agents.middleware import AgentMiddleware
+from langchain.messages import ToolMessage
+from langchain.tools.tool_node import ToolCallRequest
+from langgraph.types import Command
+from src.utils.prompt_cache import PromptCache
+from src.utils.source_versions import content_text, extract_tags_from_text, tool_tag
+
+
+class ToolCacheMiddleware(AgentMiddleware):
+    """
+    Caches tool results beneath the agent loop.
+
+    Every tool call the agent makes (MCP, RAG, web search or any other tool
+    passed to create_agent) goes through this middleware. Results are keyed by
+    tool name and arguments and kept for a per-tool TTL, so different final
+    questions that trigger the same tool call skip the Postgres / Tavily /
+    Google Drive round-trip.
+    """
+
+    def __init__(
+        self,
+        ttls: Optional[Dict[str, float]] = None,
+        default_ttl: float = 15 * 60,
+        store: Optional[PromptCache] = None,
+    ):
+        """
+        Initialize the tool cache
+
+        Args:
+            ttls: Seconds to keep results per tool name, e.g. {"search": 600}
+            default_ttl: TTL for tools not listed in `ttls`
+            store: Backing cache, defaults to an in-memory PromptCache
+        """
+        super().__init__()
+        self.ttls = ttls or {}
+        self.default_ttl = default_ttl
+        self.store = store or PromptCache(max_bytes=20 * 1024 * 1024, default_ttl=default_ttl)
+        self.tool_stats: Dict[str, Dict[str, int]] = {}
+
+    def _create_key(self, tool_name: str, args: Dict[str, Any]) -> str:
+        """Create hash from tool name and its arguments"""
+        content = json.dumps({"tool": tool_name, "args": args}, sort_keys=True, default=str)
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def _record(self, tool_name: str, outcome: str):
+        counters = self.tool_stats.setdefault(tool_name, {"hits": 0, "misses": 0})
+        counters[outcome] += 1
+
+    @staticmethod
+    def _is_cacheable(result: Any) -> bool:
+        """Only cache successful tool messages; our tools report failures as 'Error ...' text"""
+        if not isinstance(result, ToolMessage) or result.status == "error":
+            return False
+        # MCP results are content-block lists, so check their text
+        return not content_text(result.content).lstrip().startswith("Error")
+
+    def _lookup(self, request: ToolCallRequest) -> Optional[ToolMessage]:
+        tool_call = request.tool_call
+        key = self._create_key(tool_call["name"], tool_call["args"])
+        content = self.store.get_by_key(key)
+        if content is None:
+            self._record(tool_call["name"], "misses")
+            return None
+
+        self._record(tool_call["name"], "hits")
+        return ToolMessage(
+            content=content,
+            tool_call_id=tool_call["id"],
+            name=tool_call["name"],
+        )
+
+    def _save(self, request: ToolCallRequest, result: Any):
+        if not self._is_cacheable(result):
+            return
+        tool_call = request.tool_call
+        key = self._create_key(tool_call["name"], tool_call["args"])
+        ttl = self.ttls.get(tool_call["name"], self.default_ttl)
+        # Tag with the tool and the documents it returned so edits invalidate it
+        tags = {tool_tag(tool_call["name"])} | extract_tags_from_text(result.content)
+        self.store.set_by_key(key, result.content, ttl=ttl, tags=tags)
+
+    def wrap_tool_call(
+        self,
+        request: ToolCallRequest,
+        handler: Callable[[ToolCallRequest], ToolMessage | Command],
+    ) -> ToolMessage | Command:
+        cached = self._lookup(request)
+        if cached is not None:
+            return cached
+        result = handler(request)
+        self._save(request, result)
+        return result
+
+    async def awrap_tool_call(
+        self,
+        request: ToolCallRequest,
+        handler: Callable[[ToolCallRequest], Awaitable[ToolMessage | Command]],
+    ) -> ToolMessage | Command:
+        cached = self._lookup(request)
+        if cached is not None:
+            return cached
+        result = await handler(request)
+        self._save(request, result)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Return per-tool hit/miss counters and store usage"""
+        return {
+            "tools": {name: dict(counters) for name, counters in self.tool_stats.items()},
+            "store": self.store.stats(),
+        }
+
+    def clear(self):
+        """Clear all cached tool results"""
+        self.store.clear()